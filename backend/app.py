@@ -1,29 +1,259 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS # Import CORS
-import cv2, dlib, numpy as np, base64, re, time, datetime
+import cv2, numpy as np, base64, time, datetime, os, json, threading, atexit
+
+try:
+    from flask_sock import Sock  # opsional: endpoint WebSocket /ws/frames
+except ImportError:
+    Sock = None
 from supabase_client import supabase
-from collections import deque
+from session_store import SessionRegistry
+from history_writer import HistoryWriter
+from history_stats import SUMMARY_COLUMNS, PERIODS, rollup
+from cache import TTLCache
+import metrics
+import models
+from blink_analysis import landmark_buffer, mean_ear
+from face_tracking import FaceTrack, plan_track, verify_due, find_landmarks, commit_track
+from inference_pool import InferencePool, PoolOverloaded
 
 app = Flask(__name__)
-CORS(app) # Aktifkan CORS untuk semua route
+CORS(app, expose_headers=["X-Next-Before", "Server-Timing"]) # Aktifkan CORS untuk semua route
+sock = Sock(app) if Sock is not None else None
+
+# --- Model Dlib: dimuat lazy lewat models.py (LANDMARK_MODEL_PATH) ---
+# PRELOAD_MODELS=1 (default) -> mulai dimuat di background saat startup, /ready = 200 setelah selesai.
+# PRELOAD_MODELS=0 -> baru dimuat saat frame pertama atau probe /ready pertama.
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "1") == "1"
+
+# --- Worker pool inferensi (opsional) ---
+# INFERENCE_WORKERS=0 -> deteksi jalan inline di thread request (perilaku lama)
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))
+INFERENCE_BATCH = int(os.environ.get("INFERENCE_BATCH", 8))
+INFERENCE_QUEUE = int(os.environ.get("INFERENCE_QUEUE", 64))       # antrian maksimum, frame tertua dibuang
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", 2.0))
+# fork -> worker berbagi model yang sudah dimuat proses ini (copy-on-write); spawn -> tiap worker memuat sendiri
+INFERENCE_START_METHOD = os.environ.get("INFERENCE_START_METHOD", "spawn")
 
-# --- Inisialisasi Model Dlib (tetap sama) ---
-detector = dlib.get_frontal_face_detector()
-predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+_pool = None
+_pool_lock = threading.Lock()
 
-# --- Variabel Global & Fungsi (tetap sama) ---
+def get_pool():
+    """Pool dibuat saat frame pertama, bukan saat import (hindari spawn ganda oleh reloader)."""
+    global _pool
+    if INFERENCE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            if INFERENCE_START_METHOD == "fork":
+                models.load()  # muat sebelum fork supaya worker tidak memuat ulang
+            _pool = InferencePool(INFERENCE_WORKERS, batch_size=INFERENCE_BATCH, queue_size=INFERENCE_QUEUE,
+                                  max_wait=INFERENCE_TIMEOUT, start_method=INFERENCE_START_METHOD)
+    return _pool
+
+# --- Variabel Global & Fungsi ---
 EAR_THRESHOLD = 0.20
-TOTAL_BLINKS = 0
-LAST_BLINK_TIME = time.time()
-START_TIME = None
-BLINK_TIMESTAMPS = deque()
-EYE_CLOSED = False
-
-def eye_aspect_ratio(eye):
-    A = np.linalg.norm(eye[1] - eye[5])
-    B = np.linalg.norm(eye[2] - eye[4])
-    C = np.linalg.norm(eye[0] - eye[3])
-    return (A + B) / (2.0 * C)
+FRAME_INTERVAL_MS = int(os.environ.get("FRAME_INTERVAL_MS", 100))        # laju kirim dasar yang disarankan ke client
+INLINE_CAPACITY = int(os.environ.get("INLINE_CAPACITY", os.cpu_count() or 1))  # frame paralel tanpa pool
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+# Tiap koneksi /ws/frames memegang satu thread server selama kamera tersambung; di atas batas ini
+# koneksi baru langsung ditutup (client lanjut lewat POST) supaya thread untuk request HTTP tetap ada.
+# Samakan dengan WS_STREAMS di gunicorn.conf.py.
+WS_STREAMS = int(os.environ.get("WS_STREAMS", 32))
+_ws_slots = threading.BoundedSemaphore(WS_STREAMS)
+SESSION_TTL_SEC = int(os.environ.get("SESSION_TTL_SEC", 300))  # sesi idle dihapus setelah ini
+
+# Cache hasil query /history dan /history/summary; dikosongkan saat ada insert/delete
+history_cache = TTLCache(maxsize=int(os.environ.get("HISTORY_CACHE_SIZE", 256)),
+                         ttl=float(os.environ.get("HISTORY_CACHE_TTL", 60)))
+
+# Kolom yang dipakai halaman History (tidak pakai select("*"))
+HISTORY_COLUMNS = ("id, user_id, device_id, session_id, captured_at, blink_count, "
+                   "blink_per_minute, stare_duration_sec, warning_triggered")
+SUMMARY_PAGE_SIZE = 1000
+
+# Insert blink_history lewat write-behind queue (bulk insert, retry + journal lokal saat offline)
+history_writer = HistoryWriter(
+    supabase,
+    on_flush=lambda rows: history_cache.clear(),
+    batch_size=int(os.environ.get("HISTORY_BATCH_SIZE", 50)),
+    flush_interval=float(os.environ.get("HISTORY_FLUSH_SEC", 2.0)),
+    journal_path=os.environ.get("HISTORY_JOURNAL", "blink_history_journal.jsonl"),
+    dead_letter_path=os.environ.get("HISTORY_DEAD_LETTER", "blink_history_rejected.jsonl"),
+)
+
+# Thread background tidak dijalankan saat import: worker spawn inference_pool menjalankan ulang
+# app.py sebagai __mp_main__, dan master gunicorn (preload_app) hanya mengimpor lalu fork
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_services():
+    """Nyalakan history writer dan (opsional) muat model di background. Aman dipanggil berkali-kali."""
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+    history_writer.start()
+    atexit.register(history_writer.close)
+    # Proses ini hanya butuh model bila deteksi jalan inline atau worker di-fork dari sini
+    if PRELOAD_MODELS and (INFERENCE_WORKERS <= 0 or INFERENCE_START_METHOD == "fork"):
+        models.load_async()
+
+@app.before_request
+def ensure_services():
+    # Untuk server WSGI lain / flask run: layanan dinyalakan pada request pertama
+    if not _services_started:
+        start_services()
+
+# State kedipan disimpan per sesi (lihat session_store.py), bukan di global
+sessions = SessionRegistry(ttl=SESSION_TTL_SEC)
+
+metrics.gauge("smarteye_active_sessions", "Sesi kedipan yang sedang aktif", lambda: len(sessions))
+metrics.gauge("smarteye_inflight_frames", "Frame yang sedang diproses", lambda: _inflight)
+metrics.gauge("smarteye_inference_queue_depth", "Frame yang menunggu di antrian worker pool",
+              lambda: _pool.queue_depth() if _pool is not None else 0)
+metrics.gauge("smarteye_history_pending", "Record blink_history yang belum tersimpan",
+              lambda: history_writer.pending())
+metrics.gauge("smarteye_history_cache_entries", "Entri di cache history", lambda: len(history_cache))
+
+def session_key(payload):
+    """Key sesi: header X-Session-Id, lalu session_id, lalu device_id dari payload."""
+    key = request.headers.get("X-Session-Id")
+    for field in ("session_id", "device_id"):
+        if key is None:
+            key = payload.get(field)
+        if key is None:
+            key = request.args.get(field)
+    return str(key) if key is not None else "default"
+
+def parse_roi(value):
+    """ROI dari client: dict {x, y, scale} atau string "x,y,scale" (header X-Roi).
+
+    Piksel (u, v) pada gambar yang dikirim = ((u / scale) + x, (v / scale) + y) pada frame kamera penuh.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        x, y, scale = (float(v) for v in value.split(","))
+    else:
+        x, y, scale = float(value["x"]), float(value["y"]), float(value["scale"])
+    return (x, y, scale) if scale > 0 else None
+
+ROI_ERRORS = (ValueError, KeyError, TypeError)  # roi/X-Roi rusak, mis. "1,2" → 400, bukan 500
+
+def suggested_interval_ms():
+    """Hint backpressure untuk client: interval kirim frame berikutnya, naik saat server sibuk."""
+    pool = _pool
+    if pool is not None:
+        load = pool.queue_depth() / pool.queue_size
+    else:
+        load = max(_inflight - INLINE_CAPACITY, 0) / INLINE_CAPACITY
+    return int(min(FRAME_INTERVAL_MS * (1 + 4 * load), 1000))
+
+def decode_frame(buf):
+    """Decode JPEG langsung dari buffer (bytes/memoryview) tanpa menyalin data."""
+    nparr = np.frombuffer(buf, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def analyze_frame(session, frame, roi=None, timer=metrics.NULL_TIMER):
+    """Jalankan deteksi kedipan pada satu frame BGR dan kembalikan hasil untuk client."""
+    if frame is None:
+        return {"error": "Frame tidak valid (gagal decode JPEG)."}
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    timer.mark("gray")
+    message = "Wajah tidak terdeteksi." # Pesan default
+
+    # Satu sesi diproses berurutan (state tracking bergantung pada frame sebelumnya)
+    with session.lock:
+        if session.track is None:
+            session.track = FaceTrack()
+        if roi != session.roi:
+            # Client mengganti crop: koordinat rect lama tidak berlaku lagi
+            session.track.reset()
+            session.roi = roi
+        hint = plan_track(session.track, gray)
+        verify = verify_due(session.track)  # diabaikan bila hint None (deteksi penuh)
+        timer.mark("track")
+        pool = get_pool()
+        if pool is not None:
+            faces, shapes = pool.infer(gray, hint, verify, timeout=INFERENCE_TIMEOUT)
+            timer.mark("inference")  # detect + predict di worker, termasuk waktu antre
+        else:
+            faces, shapes = find_landmarks(models.get_detector(), models.get_predictor(), gray, hint,
+                                           out=landmark_buffer(), timer=timer, verify=verify)
+        path = commit_track(session.track, gray, hint, faces, shapes)
+
+        now = time.time()
+        blinks_before = session.total_blinks
+        if len(faces) > 0:
+            # Biasanya satu wajah (yang di-track): EAR per wajah, tanpa menumpuk array baru
+            for shape in shapes:
+                session.update(mean_ear(shape), EAR_THRESHOLD, now)
+            timer.mark("ear")
+
+            blink_rate = session.blink_rate(now)
+
+            if now - session.last_blink_time > 10: # Peringatan jika tidak berkedip selama 10 detik
+                message = "⚠️ Anda sudah lama tidak berkedip. Istirahatkan mata Anda!"
+            elif blink_rate > 30:
+                message = "⚠️ Kedipan terlalu sering. Mungkin mata Anda lelah."
+            else:
+                message = "Deteksi berjalan normal."
+        else:
+            blink_rate = len(session.blink_timestamps)
+        total_blinks = session.total_blinks
+
+    metrics.FRAMES.inc(label_value=path)
+    metrics.FACES.inc(len(faces))
+    metrics.BLINKS.inc(total_blinks - blinks_before)
+
+    # Kotak wajah dalam koordinat frame kamera penuh, dipakai client untuk crop frame berikutnya
+    face_box = None
+    if faces:
+        x, y, scale = roi or (0.0, 0.0, 1.0)
+        f = faces[0]
+        face_box = [int(f.left() / scale + x), int(f.top() / scale + y),
+                    int(f.right() / scale + x), int(f.bottom() / scale + y)]
+
+    return {
+        "message": message,
+        "total_blinks": total_blinks,
+        "blink_rate": blink_rate,
+        "path": path,  # "detect" | "track" | "none": jalur deteksi wajah yang dipakai frame ini
+        "face_box": face_box
+    }
+
+def handle_frame(key, buf, roi=None, timer=None):
+    """Decode + analisis satu frame untuk sesi `key`. Kembalikan (hasil, status HTTP)."""
+    global _inflight
+    timer = timer or metrics.start_timer()
+    session = sessions.get_or_create(key)
+    with _inflight_lock:
+        _inflight += 1
+    try:
+        frame = decode_frame(buf)
+        timer.mark("decode")
+        result = analyze_frame(session, frame, roi, timer)
+        status = 400 if "error" in result else 200
+    except PoolOverloaded as e:
+        metrics.FRAMES_DROPPED.inc()
+        result, status = {"error": str(e)}, 503
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+    timer.finish()
+    result["suggested_interval_ms"] = suggested_interval_ms()
+    return result, status
+
+def frame_response(result, status, timer):
+    response = jsonify(result)
+    if metrics.TIMING_HEADERS:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response, status
 
 # --- API Endpoints ---
 
@@ -32,24 +262,120 @@ def api_home():
     # Endpoint dasar untuk mengecek apakah API berjalan
     return jsonify({"message": "EyeCare API is running!"})
 
+def query_history(columns, user_id=None, device_id=None, before=None, since=None, limit=20):
+    """Satu halaman blink_history, terbaru dulu (urut captured_at, id).
+
+    `before` = cursor keyset (captured_at, id) dari baris terakhir halaman sebelumnya; id boleh None
+    (cursor lama, hanya captured_at). `columns` harus memuat captured_at dan id.
+    """
+    q = supabase.table("blink_history").select(columns)
+    if user_id is not None:
+        q = q.eq("user_id", user_id)
+    if device_id is not None:
+        q = q.eq("device_id", device_id)
+    if before is not None:
+        captured_at, row_id = before
+        if row_id is None:
+            q = q.lt("captured_at", captured_at)
+        else:
+            # Baris dengan captured_at sama di batas halaman tidak terlewat
+            q = q.or_(f'captured_at.lt."{captured_at}",and(captured_at.eq."{captured_at}",id.lt.{row_id})')
+    if since is not None:
+        q = q.gte("captured_at", since)
+    with metrics.timed("supabase_select"):
+        return q.order("captured_at", desc=True).order("id", desc=True).limit(limit).execute().data  # kolom ERD
+
+def parse_cursor(value):
+    """Cursor "captured_at,id" (header X-Next-Before) -> (captured_at, id). Tanpa ",id" -> (captured_at, None)."""
+    if not value:
+        return None
+    captured_at, sep, row_id = value.rpartition(",")
+    if not sep:
+        return value, None
+    return captured_at, int(row_id)
+
+def next_cursor(row):
+    return f"{row['captured_at']},{row['id']}"
+
+@app.route('/metrics')
+def get_metrics():
+    # Format teks Prometheus; matikan dengan METRICS_ENABLED=0
+    if not metrics.ENABLED:
+        return jsonify({"error": "Metrics dinonaktifkan (METRICS_ENABLED=0)"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/ready')
+def ready():
+    # Readiness probe: 503 sampai model siap, supaya load balancer belum mengirim frame
+    status = models.status()
+    if INFERENCE_WORKERS > 0:
+        try:
+            pool = get_pool()  # probe pertama sekaligus menyalakan pool
+        except Exception as e:
+            status.update(ready=False, error=str(e))
+            return jsonify(status), 503
+        # Model dimuat (atau diwarisi lewat fork) di tiap worker; siap bila semua worker melapor
+        status["inference_pool"] = pool.status()
+        status["ready"] = pool.ready()
+    elif not status["ready"]:
+        models.load_async()  # PRELOAD_MODELS=0: probe memicu pemuatan, tidak menunggu frame pertama
+    return jsonify(status), 200 if status["ready"] else 503
+
 @app.route('/history', methods=['GET'])
 def get_history():
     # Mengambil data dari Supabase dan mengembalikannya sebagai JSON
     #  Menggunakan captured_at & dukung filter user_id/device_id
+    #  Pagination keyset: ?before=<cursor "captured_at,id">, cursor berikutnya ada di header X-Next-Before
+    #  Catatan: cache per proses; dengan beberapa worker gunicorn, DELETE hanya mengosongkan cache
+    #  worker yang menanganinya, worker lain bisa menyajikan data lama sampai HISTORY_CACHE_TTL habis.
     try:
         user_id = request.args.get("user_id", type=int)
         device_id = request.args.get("device_id", type=int)
         limit = request.args.get("limit", default=20, type=int)
+        if limit < 1:
+            return jsonify({"error": "limit minimal 1"}), 400
+        try:
+            before = parse_cursor(request.args.get("before"))
+        except ValueError:
+            return jsonify({"error": "before harus berformat captured_at,id"}), 400
+        since = request.args.get("since")
+
+        key = ("history", user_id, device_id, limit, before, since)
+        records = history_cache.get_or_compute(
+            key, lambda: query_history(HISTORY_COLUMNS, user_id, device_id, before, since, limit))
+
+        response = jsonify(records)
+        if len(records) == limit:
+            response.headers["X-Next-Before"] = next_cursor(records[-1])
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/history/summary', methods=['GET'])
+def get_history_summary():
+    """Rollup harian/mingguan/per device: jumlah sesi & kedipan, rata-rata blink/menit, jumlah peringatan"""
+    try:
+        period = request.args.get("period", default="daily")
+        if period not in PERIODS:
+            return jsonify({"error": f"period harus salah satu dari {', '.join(PERIODS)}"}), 400
+        user_id = request.args.get("user_id", type=int)
+        device_id = request.args.get("device_id", type=int)
+        days = request.args.get("days", default=30, type=int)
+        tz_offset_min = request.args.get("tz_offset_min", default=0, type=int)  # zona waktu client
 
-        q = supabase.table("blink_history").select("*")
-        if user_id is not None:
-            q = q.eq("user_id", user_id)
-        if device_id is not None:
-            q = q.eq("device_id", device_id)
+        def compute():
+            since = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
+            rows, before = [], None
+            while True:
+                page = query_history(SUMMARY_COLUMNS, user_id, device_id, before, since, SUMMARY_PAGE_SIZE)
+                rows.extend(page)
+                if len(page) < SUMMARY_PAGE_SIZE:
+                    break
+                before = (page[-1]["captured_at"], page[-1]["id"])
+            return rollup(rows, period, tz_offset_min)
 
-        response = q.order("captured_at", desc=True).limit(limit).execute()  # kolom ERD
-        records = response.data
-        return jsonify(records)
+        key = ("summary", period, user_id, device_id, days, tz_offset_min)
+        return jsonify(history_cache.get_or_compute(key, compute))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -57,76 +383,79 @@ def get_history():
 def delete_history(record_id):
     """Menghapus 1 record dari blink_history berdasarkan ID"""
     try:
-        supabase.table("blink_history").delete().eq("id", record_id).execute()
+        with metrics.timed("supabase_delete"):
+            supabase.table("blink_history").delete().eq("id", record_id).execute()
+        history_cache.clear()
         return jsonify({"message": f"Record dengan ID {record_id} berhasil dihapus"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/process_frame', methods=['POST'])
 def process_frame():
-    # Logika ini sebagian besar tetap sama, karena sudah memproses dan mengembalikan JSON
-    global TOTAL_BLINKS, LAST_BLINK_TIME, START_TIME, EYE_CLOSED, BLINK_TIMESTAMPS
-
-    if START_TIME is None:
-        START_TIME = time.time()
-        LAST_BLINK_TIME = time.time() # Inisialisasi last blink time
-        BLINK_TIMESTAMPS.clear()
-        EYE_CLOSED = False
-
+    # Fallback lama: JSON berisi data URL base64
+    timer = metrics.start_timer()
     data = request.get_json()
-    img_str = re.search(r'base64,(.*)', data['image']).group(1)
-    nparr = np.frombuffer(base64.b64decode(img_str), np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-    faces = detector(gray)
-    message = "Wajah tidak terdeteksi." # Pesan default
-    blink_rate = len(BLINK_TIMESTAMPS)  # default agar variabel selalu ada
-
-    if len(faces) > 0:
-        for face in faces:
-            landmarks = predictor(gray, face)
-            left_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 42)])
-            right_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(42, 48)])
-            ear = (eye_aspect_ratio(left_eye) + eye_aspect_ratio(right_eye)) / 2.0
-
-            if ear < EAR_THRESHOLD and not EYE_CLOSED:
-                EYE_CLOSED = True
-            elif ear >= EAR_THRESHOLD and EYE_CLOSED:
-                TOTAL_BLINKS += 1
-                LAST_BLINK_TIME = time.time()
-                EYE_CLOSED = False
-                BLINK_TIMESTAMPS.append(LAST_BLINK_TIME)
-
-        now = time.time()
-        while BLINK_TIMESTAMPS and now - BLINK_TIMESTAMPS[0] > 60:
-            BLINK_TIMESTAMPS.popleft()
+    try:
+        roi = parse_roi(data.get('roi'))
+    except ROI_ERRORS as e:
+        return jsonify({"error": f"roi tidak valid: {e}"}), 400
+    img_str = data['image'].rpartition('base64,')[2]  # buang prefix "data:image/jpeg;base64," tanpa regex
+    buf = base64.b64decode(img_str)
+    timer.mark("base64")
+    result, status = handle_frame(session_key(data), buf, roi, timer)
+    return frame_response(result, status, timer)
 
-        blink_rate = len(BLINK_TIMESTAMPS)
+@app.route('/process_frame/raw', methods=['POST'])
+def process_frame_raw():
+    # Body berisi byte JPEG mentah (Content-Type: image/jpeg), key sesi lewat header/query string,
+    # crop client (opsional) lewat header X-Roi: "x,y,scale"
+    timer = metrics.start_timer()
+    try:
+        roi = parse_roi(request.headers.get("X-Roi"))
+    except ROI_ERRORS as e:
+        return jsonify({"error": f"X-Roi tidak valid: {e}"}), 400
+    result, status = handle_frame(session_key({}), request.get_data(cache=False), roi, timer)
+    return frame_response(result, status, timer)
 
-        if now - LAST_BLINK_TIME > 10: # Peringatan jika tidak berkedip selama 10 detik
-            message = "⚠️ Anda sudah lama tidak berkedip. Istirahatkan mata Anda!"
-        elif blink_rate > 30:
-            message = "⚠️ Kedipan terlalu sering. Mungkin mata Anda lelah."
-        else:
-            message = "Deteksi berjalan normal."
+if sock is not None:
+    @sock.route('/ws/frames')
+    def ws_frames(ws):
+        # Satu koneksi per kamera: tiap pesan biner = satu frame JPEG, hasil dikirim balik sebagai JSON.
+        # Pesan teks (JSON) boleh dipakai untuk mengirim session_id/device_id dan roi crop.
+        if not _ws_slots.acquire(blocking=False):
+            ws.close(1013, "Server penuh, kirim frame lewat POST")  # 1013 = try again later
+            return
+        try:
+            serve_frame_socket(ws)
+        finally:
+            _ws_slots.release()
 
-    return jsonify({
-        "message": message,
-        "total_blinks": TOTAL_BLINKS,
-        "blink_rate": blink_rate
-    })
+    def serve_frame_socket(ws):
+        key = session_key({})
+        roi = None
+        while True:
+            msg = ws.receive()
+            if msg is None:
+                break
+            # Error per pesan dikirim balik sebagai {"error": ...}; koneksi tetap terbuka
+            if isinstance(msg, str):
+                try:
+                    meta = json.loads(msg)
+                    if "roi" in meta:
+                        roi = parse_roi(meta["roi"])
+                    if "session_id" in meta or "device_id" in meta:
+                        key = session_key(meta)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    ws.send(json.dumps({"error": f"Pesan teks tidak valid: {e}"}))
+                continue
+            try:
+                result, _ = handle_frame(key, msg, roi)
+            except Exception as e:
+                result = {"error": str(e), "suggested_interval_ms": suggested_interval_ms()}
+            ws.send(json.dumps(result))
 
 @app.route('/stop_detection', methods=['POST']) # Ubah ke POST untuk konsistensi
 def stop_detection():
-    global TOTAL_BLINKS, START_TIME, LAST_BLINK_TIME, BLINK_TIMESTAMPS
-
-    if START_TIME is None:
-        return jsonify({"error": "Detection never started"}), 400
-
-    duration = int(time.time() - START_TIME)
-
-    # Hanya simpan jika durasi lebih dari beberapa detik, misal 10 detik
     # Mengambil user_id & device_id dari payload untuk FK
     payload = request.get_json(silent=True) or {}
     user_id = payload.get("user_id")
@@ -135,20 +464,36 @@ def stop_detection():
 
     if user_id is None or device_id is None:
         return jsonify({"error": "user_id dan device_id wajib dikirim pada stop_detection"}), 400
+    # Divalidasi sebelum sesi dikeluarkan, supaya data kedipan tidak hilang karena input salah
+    try:
+        user_id, device_id = int(user_id), int(device_id)
+        session_id = int(session_id) if session_id is not None else None  # FK sessions.id
+    except (TypeError, ValueError):
+        return jsonify({"error": "user_id, device_id dan session_id harus berupa angka"}), 400
+
+    # Sesi dikeluarkan dari registry sekaligus (reset state)
+    session = sessions.pop(session_key(payload))
+    if session is None:
+        return jsonify({"error": "Detection never started"}), 400
 
-    if duration > 10 and TOTAL_BLINKS >= 0:
+    with session.lock:
+        duration = int(time.time() - session.start_time)
+        blink_count = session.total_blinks
+        last_blink_time = session.last_blink_time
+
+    # Hanya simpan jika durasi lebih dari beberapa detik, misal 10 detik
+    if duration > 10 and blink_count >= 0:
         # Menghitung metrik & disimpan ke kolom ERD
-        blink_count = TOTAL_BLINKS
         bpm = round(blink_count / max(duration / 60.0, 1e-6), 2)  # blink_per_minute
-        stare_duration_sec = int(time.time() - LAST_BLINK_TIME)
+        stare_duration_sec = int(time.time() - last_blink_time)
         warning_triggered = stare_duration_sec > 10
         now_iso = datetime.datetime.utcnow().isoformat()
 
         record = {
             # Kolom-kolom sesuai ERD
-            "user_id": int(user_id),
-            "device_id": int(device_id),
-            "session_id": int(session_id) if session_id is not None else None,
+            "user_id": user_id,
+            "device_id": device_id,
+            "session_id": session_id,
             "captured_at": now_iso,              # waktu stop dianggap waktu capture ringkasan
             "blink_count": blink_count,
             "blink_per_minute": bpm,
@@ -157,22 +502,17 @@ def stop_detection():
             "note": "auto-summary",              # bisa diganti pesan terakhir
             "created_at": now_iso
         }
-        try:
-            supabase.table("blink_history").insert(record).execute()
-        except Exception as e:
-            print(f"Error saving to Supabase: {e}")
+        # Tidak menunggu Supabase: record di-flush oleh thread history_writer
+        history_writer.put(record)
 
     response_data = {
-        "total_blinks": TOTAL_BLINKS,
+        "total_blinks": blink_count,
         "duration": duration
     }
 
-    # Reset state
-    TOTAL_BLINKS = 0
-    START_TIME = None
-    BLINK_TIMESTAMPS.clear()
-
     return jsonify(response_data)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000) # Jalankan di port 5000
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":  # proses server, bukan proses pengawas reloader
+        start_services()
+    app.run(debug=True, port=5000, threaded=True) # Jalankan di port 5000, satu thread per request
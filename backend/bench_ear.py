@@ -0,0 +1,65 @@
+# bench_ear.py
+# Micro-benchmark: ekstraksi landmark + EAR cara lama (list comprehension + 6x np.linalg.norm)
+# dibandingkan blink_analysis (hanya TRACK_POINTS, buffer dipakai ulang; batch wajah tervektorisasi).
+#
+#   python bench_ear.py [--number 20000] [--batch 64]
+#
+# Tidak butuh model .dat: full_object_detection dibuat dari titik sintetis.
+import argparse, timeit
+import dlib
+import numpy as np
+from blink_analysis import TRACK_POINTS, shape_to_array, mean_ear
+
+
+def legacy_eye_aspect_ratio(eye):
+    # Salinan fungsi lama di app.py / smart-eye.py
+    A = np.linalg.norm(eye[1] - eye[5])
+    B = np.linalg.norm(eye[2] - eye[4])
+    C = np.linalg.norm(eye[0] - eye[3])
+    return (A + B) / (2.0 * C)
+
+
+def legacy_ear(landmarks):
+    left_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 42)])
+    right_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(42, 48)])
+    return (legacy_eye_aspect_ratio(left_eye) + legacy_eye_aspect_ratio(right_eye)) / 2.0
+
+
+def synthetic_shape(rng):
+    pts = rng.integers(100, 300, size=(68, 2))
+    parts = dlib.points()
+    for x, y in pts:
+        parts.append(dlib.point(int(x), int(y)))
+    return dlib.full_object_detection(dlib.rectangle(100, 100, 300, 300), parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark ekstraksi landmark + EAR")
+    parser.add_argument("--number", type=int, default=20000, help="jumlah iterasi per kasus")
+    parser.add_argument("--batch", type=int, default=64, help="jumlah wajah untuk kasus batch")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = synthetic_shape(rng)
+    buf = np.empty((len(TRACK_POINTS), 2), dtype=np.int32)
+    batch = np.stack([shape_to_array(synthetic_shape(rng)) for _ in range(args.batch)])
+
+    # Pastikan kedua jalur menghasilkan nilai yang sama sebelum diukur
+    assert np.isclose(legacy_ear(shape), mean_ear(shape_to_array(shape, buf, TRACK_POINTS)), rtol=1e-4)
+
+    cases = [
+        ("lama: list comp + 6x norm", lambda: legacy_ear(shape)),
+        ("baru: shape_to_array(TRACK_POINTS) + mean_ear", lambda: mean_ear(shape_to_array(shape, buf, TRACK_POINTS))),
+        ("baru: mean_ear saja (landmark sudah array)", lambda: mean_ear(buf)),
+        (f"lama: {args.batch} wajah, loop", lambda: [(legacy_eye_aspect_ratio(f[36:42]) + legacy_eye_aspect_ratio(f[42:48])) / 2.0
+                                                  for f in batch]),
+        (f"baru: {args.batch} wajah, satu mean_ear", lambda: mean_ear(batch)),
+    ]
+    print(f"{'kasus':<48} {'us/panggilan':>12}")
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+        print(f"{name:<48} {best * 1e6:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# bench_replay.py
+# Benchmark offline pipeline deteksi kedipan dengan memutar ulang video/folder frame rekaman.
+#
+#   # in-process, per stage (decode, gray, detect, predict, ear)
+#   python bench_replay.py rekaman.mp4 --labels rekaman.labels.json
+#
+#   # lewat Flask app (test client), 8 client bersamaan
+#   python bench_replay.py frames/ --mode flask --clients 8
+#
+#   # lewat server yang sedang berjalan (jalankan server dengan TIMING_HEADERS=1 untuk angka per stage)
+#   python bench_replay.py rekaman.mp4 --mode http --url http://127.0.0.1:5000 --clients 8
+#
+# Mode flask/http membaca latensi per stage dari header Server-Timing; "total" diukur di client.
+# File label (JSON): {"blink_count": 12, "blink_frames": [40, 95, ...]}; blink_frames opsional.
+import argparse, json, os, sys, threading, time
+import cv2, dlib
+import numpy as np
+import metrics, models
+from blink_analysis import landmark_buffer, mean_ear
+from face_tracking import FaceTrack, plan_track, verify_due, find_landmarks, commit_track
+from session_store import BlinkSession
+
+try:
+    import resource  # hanya ada di Unix
+except ImportError:
+    resource = None
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_frames(source, max_frames=None, width=240):
+    """Baca video atau folder gambar, perkecil ke `width` (seperti client), lalu encode JPEG."""
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTS))
+        frames = (cv2.imread(p) for p in paths)
+    else:
+        cap = cv2.VideoCapture(source)
+        frames = iter(lambda: cap.read()[1], None)
+
+    encoded = []
+    for frame in frames:
+        if frame is None or (max_frames and len(encoded) >= max_frames):
+            break
+        if width and frame.shape[1] > width:
+            frame = cv2.resize(frame, (width, frame.shape[0] * width // frame.shape[1]), interpolation=cv2.INTER_AREA)
+        encoded.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 60])[1].tobytes())
+    return encoded
+
+
+def percentiles(samples):
+    if not samples:
+        return {"n": 0}
+    ms = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(samples), "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+def blink_accuracy(counted, blink_frames, labels, tolerance=3):
+    """Bandingkan hasil dengan ground truth: selisih jumlah, plus precision/recall bila blink_frames ada."""
+    acc = {"expected": labels.get("blink_count"), "counted": counted}
+    if acc["expected"] is not None:
+        acc["abs_error"] = abs(counted - acc["expected"])
+    truth = labels.get("blink_frames")
+    if truth is not None and blink_frames is not None:
+        matched, used = 0, set()
+        for f in blink_frames:
+            hit = next((t for t in truth if t not in used and abs(t - f) <= tolerance), None)
+            if hit is not None:
+                used.add(hit)
+                matched += 1
+        acc["precision"] = round(matched / len(blink_frames), 3) if blink_frames else None
+        acc["recall"] = round(matched / len(truth), 3) if truth else None
+    return acc
+
+
+def peak_rss_mb():
+    """Peak RSS proses ini (MB), atau None bila tidak tersedia (Windows)."""
+    if resource is None:
+        return None
+    # ru_maxrss dalam KiB di Linux, tetapi dalam byte di macOS
+    unit = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1)
+
+
+def parse_server_timing(header):
+    """Header Server-Timing "decode;dur=1.20, gray;dur=0.31" -> [("decode", 0.0012), ...] (detik)."""
+    stages = []
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                stages.append((name, float(value) / 1000.0))
+    return stages
+
+
+def _record(timings, stages, total):
+    with timings["lock"]:
+        for stage, dt in stages:
+            timings["stages"].setdefault(stage, []).append(dt)
+        timings["stages"].setdefault("total", []).extend(total)
+
+
+def _inprocess_client(frames, detector, predictor, threshold, timings, results, idx):
+    """Satu client in-process: pipeline yang sama dengan server (find_landmarks), diukur dengan FrameTimer."""
+    session = BlinkSession(f"bench-{idx}")
+    session.track = FaceTrack()
+    stages, total, blink_frames, paths = [], [], [], {}
+    for i, buf in enumerate(frames):
+        timer = metrics.FrameTimer()
+        t0 = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+        timer.mark("decode")
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        timer.mark("gray")
+
+        hint = plan_track(session.track, gray)
+        verify = verify_due(session.track)  # diabaikan bila hint None (deteksi penuh)
+        timer.mark("track")
+        faces, shapes = find_landmarks(detector, predictor, gray, hint,
+                                       out=landmark_buffer(), timer=timer, verify=verify)
+        path = commit_track(session.track, gray, hint, faces, shapes)
+        paths[path] = paths.get(path, 0) + 1
+
+        before = session.total_blinks
+        if shapes:
+            for shape in shapes:
+                session.update(mean_ear(shape), threshold, time.time())
+            timer.mark("ear")
+        if session.total_blinks > before:
+            blink_frames.append(i)
+        total.append(time.perf_counter() - t0)
+        stages.extend(timer.stages)
+
+    _record(timings, stages, total)
+    results[idx] = {"blinks": session.total_blinks, "blink_frames": blink_frames, "paths": paths}
+
+
+def _flask_client(frames, post, timings, results, idx):
+    stages, total, blink_frames, paths, errors = [], [], [], {}, 0
+    last = 0
+    for i, buf in enumerate(frames):
+        t0 = time.perf_counter()
+        status, data, server_timing = post(buf, f"bench-{idx}")
+        total.append(time.perf_counter() - t0)
+        stages.extend(parse_server_timing(server_timing))
+        if status != 200:
+            errors += 1
+            continue
+        paths[data.get("path")] = paths.get(data.get("path"), 0) + 1
+        if data["total_blinks"] > last:
+            blink_frames.append(i)
+            last = data["total_blinks"]
+    _record(timings, stages, total)
+    results[idx] = {"blinks": last, "blink_frames": blink_frames, "paths": paths, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay benchmark pipeline deteksi kedipan")
+    parser.add_argument("source", help="file video atau folder berisi frame gambar")
+    parser.add_argument("--mode", choices=("inprocess", "flask", "http"), default="inprocess")
+    parser.add_argument("--clients", type=int, default=1, help="jumlah client simulasi bersamaan")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="base URL untuk --mode http")
+    parser.add_argument("--labels", help="file JSON ground truth (blink_count, blink_frames)")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--width", type=int, default=240, help="lebar frame yang dikirim (0 = asli)")
+    parser.add_argument("--model", help="file shape_predictor; default mengikuti LANDMARK_MODEL_PATH (models.py)")
+    parser.add_argument("--ear-threshold", type=float, default=0.20, help="sama dengan EAR_THRESHOLD di app.py")
+    parser.add_argument("--json", help="simpan laporan ke file JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.max_frames, args.width)
+    if not frames:
+        parser.error(f"tidak ada frame yang bisa dibaca dari {args.source}")
+    labels = {}
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            labels = json.load(f)
+
+    timings = {"stages": {}, "lock": threading.Lock()}
+    results = [None] * args.clients
+
+    if args.mode == "inprocess":
+        t0 = time.perf_counter()
+        detector = models.get_detector()
+        predictor = dlib.shape_predictor(args.model) if args.model else models.get_predictor()
+        print(f"model dimuat dalam {time.perf_counter() - t0:.2f} detik")
+        target = lambda i: _inprocess_client(frames, detector, predictor, args.ear_threshold, timings, results, i)
+    else:
+        post = make_poster(args.mode, args.url)
+        target = lambda i: _flask_client(frames, post, timings, results, i)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(args.clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    processed = len(timings["stages"]["total"])
+    # Pada mode http server berjalan di proses lain: RSS yang terukur hanya milik client benchmark
+    rss_key = "client_peak_rss_mb" if args.mode == "http" else "peak_rss_mb"
+    report = {
+        "source": args.source,
+        "mode": args.mode,
+        "clients": args.clients,
+        "frames_per_client": len(frames),
+        "elapsed_sec": round(elapsed, 3),
+        "frames_per_sec": round(processed / elapsed, 2),
+        "latency": {s: percentiles(v) for s, v in timings["stages"].items()},
+        rss_key: peak_rss_mb(),
+        "clients_detail": [
+            dict(r, accuracy=blink_accuracy(r["blinks"], r["blink_frames"], labels)) if labels else r
+            for r in results
+        ],
+    }
+    for r in report["clients_detail"]:
+        r.pop("blink_frames", None)
+
+    print(f"{args.mode}: {args.clients} client x {len(frames)} frame, "
+          f"{report['frames_per_sec']} frame/detik, {rss_key} {report[rss_key]}")
+    if args.mode != "inprocess" and len(report["latency"]) == 1:
+        print("(tidak ada header Server-Timing: jalankan server dengan TIMING_HEADERS=1 untuk angka per stage)")
+    print(f"{'stage':<10} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for s, p in report["latency"].items():
+        print(f"{s:<10} {p['n']:>7} {p['p50_ms']:>9.2f} {p['p95_ms']:>9.2f} {p['p99_ms']:>9.2f}")
+    for i, r in enumerate(report["clients_detail"]):
+        print(f"client {i}: kedipan={r['blinks']} path={r['paths']}"
+              + (f" akurasi={r['accuracy']}" if "accuracy" in r else ""))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def make_poster(mode, url):
+    """Fungsi post(buf, session_id) -> (status, json, Server-Timing) untuk Flask test client atau server HTTP."""
+    headers = {"Content-Type": "image/jpeg"}
+    if mode == "flask":
+        os.environ.setdefault("SUPABASE_OFFLINE", "1")  # benchmark tidak boleh menulis ke database asli
+        metrics.TIMING_HEADERS = True                    # latensi per stage dari header Server-Timing
+        from app import app
+        client = app.test_client()
+
+        def post(buf, session_id):
+            res = client.post("/process_frame/raw", data=buf, headers=dict(headers, **{"X-Session-Id": session_id}))
+            return res.status_code, res.get_json(), res.headers.get("Server-Timing")
+        return post
+
+    import requests
+    local = threading.local()
+
+    def post(buf, session_id):
+        http = getattr(local, "http", None)
+        if http is None:
+            http = local.http = requests.Session()  # satu koneksi keep-alive per client
+        res = http.post(f"{url}/process_frame/raw", data=buf, headers=dict(headers, **{"X-Session-Id": session_id}))
+        return res.status_code, res.json(), res.headers.get("Server-Timing")
+    return post
+
+
+if __name__ == '__main__':
+    main()
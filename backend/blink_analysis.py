@@ -0,0 +1,80 @@
+# blink_analysis.py
+# Konversi landmark dlib -> numpy dan perhitungan EAR,
+# dipakai bersama oleh app.py, face_tracking.py, inference_pool.py dan smart-eye.py.
+import math, threading
+import numpy as np
+
+NUM_LANDMARKS = 68
+
+# Indeks 6 titik mata pada model 68 landmark: [mata kiri, mata kanan]
+EYE_INDICES = np.array([range(36, 42), range(42, 48)])
+
+# Titik yang benar-benar dipakai pipeline: 12 titik mata (EAR) lalu titik terluar wajah
+# (rahang kiri/kanan, dagu, alis) untuk bbox tracking. Tiap shape.part() dari Python cukup mahal,
+# jadi 17 titik ini jauh lebih murah daripada mengambil ke-68 titik.
+TRACK_POINTS = tuple(range(36, 48)) + (0, 16, 8, 19, 24)
+_COMPACT_EYE_INDICES = np.arange(12).reshape(2, 6)
+_EYE_LISTS = {NUM_LANDMARKS: EYE_INDICES.tolist(), len(TRACK_POINTS): _COMPACT_EYE_INDICES.tolist()}
+
+# Pasangan titik untuk EAR: |p2-p6|, |p3-p5| (vertikal) dan |p1-p4| (horizontal)
+_EAR_A = np.array([1, 2, 0])
+_EAR_B = np.array([5, 4, 3])
+
+_local = threading.local()
+
+
+def landmark_buffer(num_parts=len(TRACK_POINTS)):
+    """Buffer (n, 2) int32 per thread, dipakai ulang antar frame."""
+    buf = getattr(_local, "buf", None)
+    if buf is None or buf.shape[0] != num_parts:
+        buf = _local.buf = np.empty((num_parts, 2), dtype=np.int32)
+    return buf
+
+
+def shape_to_array(shape, out=None, indices=None):
+    """Ubah full_object_detection dlib menjadi array (n, 2) int32.
+
+    `indices` (mis. TRACK_POINTS) membatasi titik yang diambil; default semua titik.
+    Bila `out` diberikan, hasil ditulis ke buffer itu (tanpa alokasi baru).
+    """
+    if indices is None:
+        indices = range(shape.num_parts)
+    if out is None or out.shape[0] != len(indices):
+        out = np.empty((len(indices), 2), dtype=np.int32)
+    pts = list(map(shape.part, indices))
+    out[:, 0] = [p.x for p in pts]
+    out[:, 1] = [p.y for p in pts]
+    return out
+
+
+def _eye_indices(landmarks):
+    # Layout 68 titik penuh atau TRACK_POINTS (mata di 12 baris pertama)
+    return EYE_INDICES if landmarks.shape[-2] == NUM_LANDMARKS else _COMPACT_EYE_INDICES
+
+
+def eye_aspect_ratios(landmarks):
+    """EAR mata kiri & kanan untuk landmark (..., 68, 2) atau (..., 17, 2). Kembalikan array (..., 2).
+
+    Bisa untuk satu wajah maupun batch wajah/frame (k, n, 2) sekaligus.
+    """
+    landmarks = np.asarray(landmarks)
+    eyes = _eye_indices(landmarks)
+    diff = landmarks[..., eyes[:, _EAR_A], :] - landmarks[..., eyes[:, _EAR_B], :]  # (..., 2, 3, 2)
+    dist = np.hypot(diff[..., 0], diff[..., 1])                                      # (..., 2, 3)
+    return (dist[..., 0] + dist[..., 1]) / (2.0 * dist[..., 2])
+
+
+def mean_ear(landmarks):
+    """Rata-rata EAR kedua mata, (n, 2) -> float atau (k, n, 2) -> (k,).
+
+    Satu wajah dihitung dengan math biasa: untuk 12 titik, overhead numpy lebih besar dari hitungannya.
+    """
+    landmarks = np.asarray(landmarks)
+    if landmarks.ndim > 2:
+        return eye_aspect_ratios(landmarks).mean(axis=-1)
+    pts = landmarks.tolist()
+    total = 0.0
+    for eye in _EYE_LISTS[len(pts)]:
+        p1, p2, p3, p4, p5, p6 = (pts[i] for i in eye)
+        total += (math.dist(p2, p6) + math.dist(p3, p5)) / (2.0 * math.dist(p1, p4))
+    return total / 2.0
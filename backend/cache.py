@@ -0,0 +1,56 @@
+# cache.py
+# Cache TTL + LRU sederhana (thread-safe) untuk hasil query history/dashboard.
+import threading, time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize=256, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value), urutan = LRU
+        self._lock = threading.Lock()
+        self._generation = 0         # naik setiap clear(), supaya hasil compute lama tidak tersimpan
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Ambil dari cache, atau jalankan `compute()` lalu simpan hasilnya."""
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            with self._lock:
+                generation = self._generation
+            value = compute()
+            self.set(key, value, generation)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
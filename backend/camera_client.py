@@ -1,31 +1,93 @@
 # camera_client.py (Skrip terpisah, BUKAN app.py)
 import cv2
-import base64
+import numpy as np
 import requests
 import time
 
-API_URL = "http://127.0.0.1:5000/process_frame"
+# Kirim byte JPEG mentah (tanpa base64/JSON); /process_frame tetap tersedia sebagai fallback
+API_URL = "http://127.0.0.1:5000/process_frame/raw"
+DEVICE_ID = 2  # key sesi di backend (FK devices.id)
+
+# Laju kirim adaptif: interval mengikuti RTT & hint server (suggested_interval_ms)
+MIN_INTERVAL = 0.1
+MAX_INTERVAL = 1.0
+KEEPALIVE = 0.5        # frame tetap dikirim minimal tiap 0.5 detik walau tidak berubah
+DIFF_THRESHOLD = 2.0   # rata-rata beda piksel area mata; di bawah ini frame dilewati
+CROP_WIDTH = 160       # lebar maksimum crop wajah
+
+# Satu koneksi HTTP keep-alive untuk semua frame
+http = requests.Session()
+http.headers.update({"Content-Type": "image/jpeg", "X-Session-Id": str(DEVICE_ID)})
 
 cap = cv2.VideoCapture(0) # 0 = Kamera default
 
+roi = None          # crop wajah (x, y, w, h) pada frame kamera, dari face_box server
+last_thumb = None   # thumbnail area mata frame terakhir yang dikirim
+last_sent = 0.0
+rtt = 0.0
+server_interval = MIN_INTERVAL
+
+def update_roi(box, frame_shape):
+    # Crop hanya diganti saat wajah mendekati tepi crop, supaya tracking di server tetap berlaku
+    global roi
+    if box is None:
+        roi = None  # wajah hilang -> kirim frame penuh lagi
+        return
+    l, t, r, b = box
+    if roi is not None:
+        x, y, w, h = roi
+        if l > x + 0.1 * w and r < x + 0.9 * w and t > y + 0.1 * h and b < y + 0.9 * h:
+            return
+    mw, mh = (r - l) // 2, (b - t) // 2
+    x, y = max(0, l - mw), max(0, t - mh)
+    roi = (x, y, min(frame_shape[1], r + mw) - x, min(frame_shape[0], b + mh) - y)
+
 while True:
     ret, frame = cap.read()
     if not ret:
         break
-        
-    # Mengubah frame menjadi Base64
-    _, buffer = cv2.imencode('.jpg', frame)
-    jpg_as_text = base64.b64encode(buffer).decode('utf-8')
-    
-    # Kirim ke API Flask
+
+    # Crop ke area wajah (bila sudah diketahui) lalu perkecil
+    if roi is not None:
+        x, y, w, h = roi
+        img = frame[y:y + h, x:x + w]
+        scale = min(1.0, CROP_WIDTH / w)
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        eye_band = img[img.shape[0] // 4:img.shape[0] * 11 // 20]
+    else:
+        x = y = 0
+        scale = 1.0
+        img = eye_band = frame
+
+    # Lewati frame yang hampir sama dengan frame terakhir yang dikirim
+    thumb = cv2.resize(cv2.cvtColor(eye_band, cv2.COLOR_BGR2GRAY), (48, 16), interpolation=cv2.INTER_AREA)
+    now = time.time()
+    changed = last_thumb is None or np.abs(thumb.astype(np.int16) - last_thumb).mean() >= DIFF_THRESHOLD
+    if not changed and now - last_sent < KEEPALIVE:
+        time.sleep(MIN_INTERVAL)
+        continue
+    last_thumb, last_sent = thumb, now
+
+    # Mengubah frame menjadi JPEG
+    _, buffer = cv2.imencode('.jpg', img)
+
+    # Kirim ke API Flask (sinkron: maksimal 1 request in-flight)
     try:
-        response = requests.post(API_URL, json={'image': f"data:image/jpeg;base64,{jpg_as_text}"})
-        
-        # Tampilkan respon dari API
-        print(response.json()['message'])
-        print(f"Total Blinks: {response.json()['total_blinks']}")
-        
+        response = http.post(API_URL, data=buffer.tobytes(), headers={"X-Roi": f"{x},{y},{scale}"})
+        data = response.json()
+        rtt = time.time() - now if rtt == 0 else 0.8 * rtt + 0.2 * (time.time() - now)
+        server_interval = data.get("suggested_interval_ms", 100) / 1000.0
+
+        if response.status_code == 200:
+            update_roi(data.get("face_box"), frame.shape)
+            # Tampilkan respon dari API
+            print(data['message'])
+            print(f"Total Blinks: {data['total_blinks']}")
+        else:
+            print(f"Server: {data.get('error')}")
+
     except requests.exceptions.ConnectionError:
         print("API server is not running.")
-        
-    time.sleep(0.1) # Kirim setiap 100ms
\ No newline at end of file
+
+    interval = min(MAX_INTERVAL, max(MIN_INTERVAL, rtt * 1.2, server_interval))
+    time.sleep(max(0.0, interval - (time.time() - now)))
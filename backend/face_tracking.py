@@ -0,0 +1,173 @@
+# face_tracking.py
+# Mode tracking: deteksi HOG penuh hanya tiap N frame / T detik (atau saat tracking hilang),
+# di antaranya cukup pakai rect wajah terakhir; mode "roi" sesekali memverifikasi wajah pada crop kecil.
+import os, time
+import cv2, dlib
+import numpy as np
+from blink_analysis import TRACK_POINTS, shape_to_array
+from metrics import NULL_TIMER
+
+FACE_TRACKER = os.environ.get("FACE_TRACKER", "roi")            # "roi" | "correlation" | "off"
+DETECT_EVERY_N = int(os.environ.get("DETECT_EVERY_N", 10))        # deteksi ulang paksa tiap N frame
+DETECT_EVERY_SEC = float(os.environ.get("DETECT_EVERY_SEC", 1.0))  # ... atau bila deteksi terakhir lebih lama dari ini
+TRACK_VERIFY = os.environ.get("TRACK_VERIFY", "1") == "1"         # mode roi: cek wajah masih ada (HOG pada crop)
+VERIFY_EVERY_N = int(os.environ.get("VERIFY_EVERY_N", 4))         # ... hanya tiap N frame track (1 = tiap frame)
+VERIFY_MARGIN = float(os.environ.get("VERIFY_MARGIN", 0.5))       # perluasan rect untuk crop verifikasi
+VERIFY_FACE_PX = int(os.environ.get("VERIFY_FACE_PX", 100))       # crop verifikasi diperkecil sampai wajah selebar ini
+DETECT_SCALE = float(os.environ.get("DETECT_SCALE", 1.0))         # < 1.0 = deteksi pada frame yang diperkecil
+TRACK_MARGIN = float(os.environ.get("TRACK_MARGIN", 0.15))        # perluasan rect dari bbox landmark
+CORRELATION_MIN_PSR = float(os.environ.get("CORRELATION_MIN_PSR", 7.0))
+
+# Nilai "path" per frame, dikirim balik ke client untuk mengukur throughput
+PATH_DETECT = "detect"
+PATH_TRACK = "track"
+PATH_NONE = "none"
+
+
+class FaceTrack:
+    """State tracking wajah untuk satu sesi."""
+
+    __slots__ = ("rect", "frames_since_detect", "detected_at", "tracker")
+
+    def __init__(self):
+        self.rect = None
+        self.frames_since_detect = 0
+        self.detected_at = 0.0
+        self.tracker = None
+
+    def reset(self):
+        self.rect = None
+        self.tracker = None
+
+
+def detect_faces(detector, gray, scale=DETECT_SCALE):
+    """Jalankan detektor HOG, opsional pada frame yang diperkecil, lalu kembalikan rect skala asli."""
+    if scale >= 1.0:
+        return list(detector(gray))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return [dlib.rectangle(int(r.left() / scale), int(r.top() / scale),
+                           int(r.right() / scale), int(r.bottom() / scale))
+            for r in detector(small)]
+
+
+def _largest(faces):
+    return max(faces, key=lambda r: r.width() * r.height())
+
+
+def verify_face(detector, gray, rect, margin=VERIFY_MARGIN, face_px=VERIFY_FACE_PX):
+    """Cek murah bahwa wajah masih ada: HOG hanya pada crop `rect` yang diperluas dan diperkecil
+    (wajah ~`face_px` piksel, sedikit di atas jendela minimum HOG 80 piksel).
+
+    Kembalikan [rect wajah] dalam koordinat frame, atau [] bila wajah sudah hilang.
+    """
+    h, w = gray.shape[:2]
+    mx, my = int(rect.width() * margin), int(rect.height() * margin)
+    x0, y0 = max(rect.left() - mx, 0), max(rect.top() - my, 0)
+    x1, y1 = min(rect.right() + mx, w), min(rect.bottom() + my, h)
+    if x1 <= x0 or y1 <= y0:
+        return []
+    scale = min(face_px / max(rect.width(), 1), 1.0)
+    found = detect_faces(detector, np.ascontiguousarray(gray[y0:y1, x0:x1]), scale)
+    if not found:
+        return []
+    r = _largest(found)
+    return [dlib.rectangle(r.left() + x0, r.top() + y0, r.right() + x0, r.bottom() + y0)]
+
+
+def plan_track(track, gray, mode=FACE_TRACKER, every_n=DETECT_EVERY_N, every_sec=DETECT_EVERY_SEC):
+    """Tentukan rect yang dipakai frame ini. None berarti perlu deteksi penuh."""
+    if (mode == "off" or track.rect is None or track.frames_since_detect >= every_n
+            or time.monotonic() - track.detected_at >= every_sec):
+        return None
+    if track.tracker is not None:
+        psr = track.tracker.update(gray)
+        if psr < CORRELATION_MIN_PSR:
+            track.reset()
+            return None
+        track.rect = _to_rect(track.tracker.get_position())
+    track.frames_since_detect += 1
+    return track.rect
+
+
+def verify_due(track, mode=FACE_TRACKER, every_n=VERIFY_EVERY_N):
+    """Mode roi: apakah frame track ini perlu verify_face. Di antaranya, hilangnya wajah ditangkap
+    oleh cek bbox landmark di commit_track dan deteksi ulang paksa tiap DETECT_EVERY_N frame."""
+    return (mode == "roi" and TRACK_VERIFY and track.rect is not None
+            and track.frames_since_detect % max(every_n, 1) == 0)
+
+
+def find_landmarks(detector, predictor, gray, hint, mode=FACE_TRACKER, out=None, timer=NULL_TIMER,
+                   verify=False):
+    """Bagian berat per frame: deteksi (bila `hint` None) lalu shape_predictor.
+
+    Kembalikan (list rect, list array landmark (17, 2) berurutan TRACK_POINTS). Dipakai inline
+    maupun di worker pool.
+    `out` (opsional) adalah buffer yang dipakai ulang untuk landmark wajah pertama.
+    `timer` (opsional) mencatat stage "detect"/"verify" dan "predict".
+    `verify` (lihat verify_due): wajah di `hint` diverifikasi dulu; bila hilang, hasilnya kosong
+    (tanpa EAR palsu).
+    """
+    if hint is not None:
+        faces = [hint]
+        if verify:
+            faces = verify_face(detector, gray, hint)
+            timer.mark("verify")
+    else:
+        faces = detect_faces(detector, gray)
+        # Yang di-track hanya wajah terbesar (pengguna di depan kamera)
+        if mode != "off" and faces:
+            faces = [_largest(faces)]
+        timer.mark("detect")
+    shapes = [shape_to_array(predictor(gray, f), out if i == 0 else None, TRACK_POINTS)
+              for i, f in enumerate(faces)]
+    timer.mark("predict")
+    return faces, shapes
+
+
+def commit_track(track, gray, hint, faces, shapes, mode=FACE_TRACKER, margin=TRACK_MARGIN):
+    """Simpan hasil frame ini ke state tracking dan kembalikan path yang dipakai."""
+    if hint is not None:
+        if not faces:
+            # Verifikasi gagal: wajah hilang, frame berikutnya deteksi penuh
+            track.reset()
+            return PATH_NONE
+        path = PATH_TRACK
+        track.rect = faces[0]  # rect hasil verifikasi (sama dengan hint bila verifikasi mati)
+    else:
+        path = PATH_DETECT if faces else PATH_NONE
+        if mode == "off":
+            return path
+        track.frames_since_detect = 0
+        track.detected_at = time.monotonic()
+        if not faces:
+            track.reset()
+            return path
+        track.rect = faces[0]
+        if mode == "correlation":
+            track.tracker = dlib.correlation_tracker()
+            track.tracker.start_track(gray, faces[0])
+
+    # Mode "roi": geser rect ke bbox landmark terbaru. Tracking dianggap hilang bila bbox
+    # keluar frame atau ukurannya berubah drastis, sehingga frame berikutnya deteksi penuh.
+    if track.tracker is None and shapes:
+        (x0, y0), (x1, y1) = shapes[0].min(axis=0), shapes[0].max(axis=0)
+        _update_rect(track, x0, y0, x1, y1, gray.shape, margin)
+    return path
+
+
+def _update_rect(track, x0, y0, x1, y1, frame_shape, margin):
+    h, w = frame_shape[:2]
+    mx, my = (x1 - x0) * margin, (y1 - y0) * margin
+    left, top = max(int(x0 - mx), 0), max(int(y0 - my), 0)
+    right, bottom = min(int(x1 + mx), w - 1), min(int(y1 + my), h - 1)
+
+    old_area = track.rect.width() * track.rect.height()
+    new_area = (right - left) * (bottom - top)
+    if right <= left or bottom <= top or not 0.5 <= new_area / max(old_area, 1) <= 2.0:
+        track.reset()
+        return
+    track.rect = dlib.rectangle(left, top, right, bottom)
+
+
+def _to_rect(drect):
+    return dlib.rectangle(int(drect.left()), int(drect.top()), int(drect.right()), int(drect.bottom()))
@@ -0,0 +1,33 @@
+# gunicorn.conf.py
+# Deployment multi-worker:  gunicorn -c gunicorn.conf.py app:app
+#
+# preload_app memuat app.py sekali di proses master. Model dlib dimuat penuh di master sebelum fork,
+# jadi semua worker berbagi memori model secara copy-on-write (RSS per worker jauh lebih kecil
+# dan worker baru langsung siap tanpa membaca file model lagi).
+#
+# Worker gthread: tiap koneksi /ws/frames memegang satu thread selama kamera tersambung. Thread dibagi
+# menjadi WS_STREAMS (kamera WebSocket bersamaan per worker, dibatasi di app.py) + HTTP_THREADS
+# (request biasa), jadi batasnya WEB_CONCURRENCY x WS_STREAMS kamera. Koneksi di atas batas itu
+# langsung ditutup dan client (Detect.js) berpindah ke POST.
+import gc, os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+ws_streams = int(os.environ.get("WS_STREAMS", 32))
+http_threads = int(os.environ.get("HTTP_THREADS", 8))  # tetap tersedia walau semua slot WebSocket terpakai
+threads = int(os.environ.get("GUNICORN_THREADS", ws_streams + http_threads))
+preload_app = True
+
+
+def on_starting(server):
+    import models
+    models.load()  # tunggu sampai selesai: jangan fork saat model setengah dimuat
+    # Objek yang sudah ada dikeluarkan dari GC, supaya siklus GC di worker tidak menyentuh
+    # (dan menyalin) halaman memori milik master
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Master tidak menjalankan thread apa pun (lihat app.start_services); tiap worker menyalakan sendiri
+    from app import start_services
+    start_services()
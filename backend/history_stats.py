@@ -0,0 +1,51 @@
+# history_stats.py
+# Rollup blink_history (harian, mingguan, per device) yang sebelumnya dihitung di browser (Home.js).
+import datetime
+
+# Kolom minimum untuk agregasi (tidak pakai select("*"))
+SUMMARY_COLUMNS = "id, captured_at, device_id, blink_count, blink_per_minute, warning_triggered"
+
+PERIODS = ("daily", "weekly", "device")
+
+
+def parse_captured_at(value):
+    """captured_at dari Supabase (ISO 8601, dengan/tanpa zona waktu) -> datetime UTC."""
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)   # backend menyimpan utcnow() tanpa zona
+    return dt.astimezone(datetime.timezone.utc)
+
+
+def bucket_key(row, period, tz_offset_min=0):
+    if period == "device":
+        return row.get("device_id")
+    local = parse_captured_at(row["captured_at"]) + datetime.timedelta(minutes=tz_offset_min)
+    day = local.date()
+    if period == "weekly":
+        day -= datetime.timedelta(days=day.weekday())   # minggu dimulai hari Senin
+    return day.isoformat()
+
+
+def rollup(rows, period, tz_offset_min=0):
+    """Kelompokkan rows per periode. Kembalikan list bucket, urut berdasarkan key."""
+    if period not in PERIODS:
+        raise ValueError(f"period harus salah satu dari {', '.join(PERIODS)}")
+
+    buckets = {}
+    for r in rows:
+        key = bucket_key(r, period, tz_offset_min)
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = {"key": key, "sessions": 0, "blink_count": 0,
+                                "_bpm_sum": 0.0, "warning_count": 0}
+        b["sessions"] += 1
+        b["blink_count"] += r.get("blink_count") or 0
+        b["_bpm_sum"] += r.get("blink_per_minute") or 0.0
+        b["warning_count"] += 1 if r.get("warning_triggered") else 0
+
+    result = []
+    for key in sorted(buckets, key=lambda k: (k is None, k)):
+        b = buckets[key]
+        b["avg_blink_per_minute"] = round(b.pop("_bpm_sum") / b["sessions"], 2)
+        result.append(b)
+    return result
@@ -0,0 +1,226 @@
+# history_writer.py
+# Write-behind queue untuk tabel blink_history: request tidak lagi menunggu round trip ke Supabase.
+# Record dikumpulkan lalu di-insert sekaligus (bulk), di-retry dengan backoff, dan ditulis ke
+# journal lokal (JSON lines) selama database tidak bisa dihubungi, lalu diputar ulang saat pulih.
+# Baris yang ditolak permanen (constraint/data tidak valid) dipindah ke file dead-letter.
+# Journal boleh dipakai bersama oleh beberapa proses (mis. worker gunicorn): semua akses dikunci
+# dengan file lock `<journal>.lock`.
+import datetime, json, os, queue, threading, time
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def is_permanent_error(e):
+    """Error yang tidak akan hilang dengan retry: data tidak valid / pelanggaran constraint (4xx)."""
+    code = str(getattr(e, "code", "") or "")
+    if code[:2] in ("22", "23"):  # kelas error Postgres: data exception, integrity constraint violation
+        return True
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (401, 403, 408, 429)
+
+
+class FileLock:
+    """Lock eksklusif antar proses pada file `path` (fcntl di Unix, msvcrt di Windows)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def acquire(self, blocking=True):
+        f = open(self.path, "a+")
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if not blocking:
+                    f.close()
+                    return False
+                if fcntl is not None:
+                    f.close()
+                    raise
+                time.sleep(0.05)
+        self._f = f
+        return True
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class HistoryWriter:
+    def __init__(self, client, table="blink_history", batch_size=50, flush_interval=2.0,
+                 journal_path="blink_history_journal.jsonl", dead_letter_path="blink_history_rejected.jsonl",
+                 base_backoff=1.0, max_backoff=60.0, on_flush=None):
+        self.client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal_path = journal_path
+        self.dead_letter_path = dead_letter_path
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.on_flush = on_flush          # dipanggil setelah insert berhasil (mis. invalidasi cache)
+
+        self._queue = queue.Queue()
+        self._buffer = []
+        self._backoff = base_backoff
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._journal_lock = FileLock(journal_path + ".lock")
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()  # bisa dinyalakan lagi setelah close()
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def put(self, record):
+        """Masukkan satu record ke antrian. Tidak pernah blocking ke jaringan."""
+        self._queue.put(record)
+
+    def pending(self):
+        """Jumlah record yang belum tersimpan ke database (antrian + buffer, tanpa journal)."""
+        return self._queue.qsize() + len(self._buffer)
+
+    def close(self, timeout=10.0):
+        """Hentikan thread; sisa record di-flush, atau masuk journal bila database masih gagal."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self._buffer.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if len(self._buffer) >= self.batch_size or now - last_flush >= self.flush_interval:
+                self._flush(now)
+                last_flush = now
+
+        while True:
+            try:
+                self._buffer.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._retry_at = 0.0
+        self._flush(time.monotonic())
+
+    def _flush(self, now):
+        if now < self._retry_at:
+            # Masih dalam backoff: simpan ke journal supaya tidak hilang dan memori tetap kecil
+            self._spill()
+            return
+        try:
+            self._replay_journal()
+            self._insert_rows(self._buffer)
+        except Exception as e:
+            print(f"Error saving to Supabase (akan di-retry dalam {self._backoff:.1f} detik): {e}")
+            self._spill()
+            self._retry_at = now + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            return
+        self._backoff = self.base_backoff
+
+    def _insert_rows(self, rows):
+        """Insert `rows` per batch; baris yang selesai (masuk atau ditolak) dihapus dari list.
+
+        Error sementara diteruskan ke pemanggil dan sisa `rows` menunggu retry.
+        """
+        while rows:
+            batch = rows[:self.batch_size]
+            try:
+                self._insert(batch)
+                del rows[:len(batch)]
+                continue
+            except Exception as e:
+                if not is_permanent_error(e):
+                    raise
+            # Satu baris buruk menggagalkan seluruh batch: ulangi per baris, sisihkan yang ditolak
+            for r in batch:
+                try:
+                    self._insert([r])
+                except Exception as e:
+                    if not is_permanent_error(e):
+                        raise
+                    self._dead_letter(r, e)
+                del rows[0]
+
+    def _dead_letter(self, row, error):
+        print(f"Error saving to Supabase (baris ditolak, dipindah ke {self.dead_letter_path}): {error}")
+        line = json.dumps({"row": row, "error": str(error),
+                           "rejected_at": datetime.datetime.utcnow().isoformat()}) + "\n"
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(line)  # satu write per baris (mode append) supaya aman dari beberapa proses
+
+    def _insert(self, rows):
+        with metrics.timed("supabase_insert"):
+            self.client.table(self.table).insert(rows).execute()
+        if self.on_flush is not None:
+            self.on_flush(rows)
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        with self._journal_lock, open(self.journal_path, "a", encoding="utf-8") as f:
+            for r in self._buffer:
+                f.write(json.dumps(r) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._buffer = []
+
+    def _replay_journal(self):
+        # Lock dipegang sampai replay selesai supaya tidak ada dua proses yang memutar baris yang sama;
+        # bila proses lain sedang replay, giliran ini dilewati
+        if not self._journal_lock.acquire(blocking=False):
+            return
+        try:
+            if not os.path.exists(self.journal_path):
+                return
+            with open(self.journal_path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            try:
+                self._insert_rows(rows)
+            except Exception:
+                # Yang sudah selesai dibuang dari journal, sisanya tetap menunggu retry berikutnya
+                self._rewrite_journal(rows)
+                raise
+            os.remove(self.journal_path)
+        finally:
+            self._journal_lock.release()
+
+    def _rewrite_journal(self, rows):
+        # Dipanggil dengan _journal_lock dipegang
+        tmp = f"{self.journal_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for r in rows:
+                f.write(json.dumps(r) + "\n")
+        os.replace(tmp, self.journal_path)
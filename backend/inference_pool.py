@@ -0,0 +1,302 @@
+# inference_pool.py
+# Pool proses worker untuk deteksi wajah + landmark, supaya banyak kamera bisa memakai semua core CPU.
+# Alur: thread HTTP -> antrian terbatas (drop-oldest) -> dispatcher (batch + shared memory) -> worker -> future.
+import os, threading, time, queue
+import multiprocessing as mp
+from multiprocessing.connection import wait as wait_ready
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import dlib
+import numpy as np
+
+
+class PoolOverloaded(RuntimeError):
+    """Frame dibuang karena antrian penuh, hasil tidak datang tepat waktu, atau worker-nya mati."""
+
+
+class InferencePool:
+    """Worker proses yang memuat model dlib sekali, lalu memproses batch frame dari banyak sesi.
+
+    Frame grayscale dikirim lewat slot shared memory (bukan di-pickle); antrian tunggu dibatasi
+    `queue_size` dan frame tertua dibuang saat penuh, sehingga latensi tetap terbatas saat overload.
+
+    Dengan start_method="fork" worker mewarisi model yang sudah dimuat proses induk (copy-on-write,
+    tanpa memuat ulang); dengan "spawn" (default, paling aman) tiap worker memuat modelnya sendiri.
+
+    Tiap worker punya antrian tugas dan pipe hasil sendiri, jadi bila worker mati (crash/OOM kill)
+    pool tahu frame mana yang hilang: future-nya digagalkan, slot-nya dikembalikan, dan worker
+    dijalankan ulang. Tidak ada lock antar-proses yang bisa tertinggal terkunci oleh worker yang mati.
+    """
+
+    def __init__(self, workers, batch_size=8, queue_size=64, slots=None,
+                 max_frame_bytes=1920 * 1080, max_wait=1.0, start_method="spawn"):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_wait = max_wait  # frame yang menunggu lebih lama dari ini dibuang
+        self.max_frame_bytes = max_frame_bytes
+        self.dropped = 0
+
+        # Satu slot per frame yang sedang diproses; cukup untuk mengisi semua worker dengan batch penuh
+        n_slots = slots or workers * batch_size * 2
+        self._shm = [shared_memory.SharedMemory(create=True, size=max_frame_bytes) for _ in range(n_slots)]
+        self._free_slots = queue.SimpleQueue()
+        for i in range(n_slots):
+            self._free_slots.put(i)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._futures = {}      # job_id -> (future, slot, indeks worker)
+        self._assigned = [set() for _ in range(workers)]  # job_id yang sedang dikerjakan tiap worker
+        self._next_id = 0
+        self._closed = False
+        self._ready = set()     # pid worker yang sudah selesai memuat model
+        self.load_errors = {}   # pid -> pesan error bila worker gagal memuat model
+        self.restarts = 0
+        self._reaped = set()    # pid worker mati yang sudah ditangani
+
+        self._ctx = mp.get_context(start_method)
+        self._tasks = [None] * workers
+        self._results = [None] * workers
+        self._procs = [None] * workers
+        for i in range(workers):
+            self._spawn(i)
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+        self._dispatcher.start()
+        self._collector.start()
+
+    def _spawn(self, i):
+        # Dipanggil dari __init__ atau dengan self._cond dipegang
+        self._tasks[i] = self._ctx.Queue()
+        self._results[i], send = self._ctx.Pipe(duplex=False)
+        self._procs[i] = self._ctx.Process(target=_worker_main, daemon=True,
+                                           args=(self._tasks[i], send, [s.name for s in self._shm]))
+        self._procs[i].start()
+        send.close()  # salinan milik worker saja yang tersisa: pipe EOF begitu worker mati
+
+    def submit(self, gray, hint=None, verify=False):
+        """Masukkan satu frame grayscale ke antrian. Kembalikan Future berisi (faces, shapes).
+
+        `hint`/`verify` diteruskan ke find_landmarks di worker.
+        """
+        if gray.nbytes > self.max_frame_bytes:
+            raise ValueError(f"Frame terlalu besar untuk slot shared memory ({gray.nbytes} bytes)")
+        fut = Future()
+        hint = (hint.left(), hint.top(), hint.right(), hint.bottom()) if hint is not None else None
+        with self._cond:
+            if len(self._pending) >= self.queue_size:
+                old = self._pending.popleft()[-1]
+                # Future yang sudah di-cancel (infer() timeout) cukup dibuang; yang lain diberi error
+                if old.set_running_or_notify_cancel():
+                    old.set_exception(PoolOverloaded("Frame dibuang: antrian inferensi penuh"))
+                    self.dropped += 1
+            self._pending.append((np.ascontiguousarray(gray), hint, verify, time.time(), fut))
+            self._cond.notify()
+        return fut
+
+    def infer(self, gray, hint=None, verify=False, timeout=2.0):
+        """Versi blocking dari `submit` untuk thread request."""
+        fut = self.submit(gray, hint, verify)
+        try:
+            faces, shapes = fut.result(timeout=timeout)
+        except FutureTimeout:
+            fut.cancel()
+            raise PoolOverloaded("Hasil inferensi tidak datang tepat waktu")
+        return [dlib.rectangle(*r) for r in faces], shapes
+
+    def ready(self):
+        """True bila semua worker hidup dan sudah memuat model."""
+        with self._cond:
+            return all(p.pid in self._ready and p.is_alive() for p in self._procs)
+
+    def status(self):
+        with self._cond:
+            ready = sum(1 for p in self._procs if p.pid in self._ready and p.is_alive())
+            return {"workers": self.workers, "ready_workers": ready, "restarts": self.restarts,
+                    "errors": list(self.load_errors.values())}
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for tasks in self._tasks:
+            tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+        self._collector.join(timeout=5)
+        for conn in self._results:
+            if conn is not None:
+                conn.close()
+        for s in self._shm:
+            s.close()
+            s.unlink()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Tunggu slot kosong di luar lock supaya submit tetap bisa membuang frame tertua
+            slot = self._free_slots.get()
+            batch = []
+            with self._cond:
+                # Batch ke worker hidup dengan pekerjaan paling sedikit
+                alive = [i for i, p in enumerate(self._procs) if p.is_alive()]
+                if not alive:
+                    self._fail_pending("Tidak ada worker inferensi yang hidup")
+                worker = min(alive, key=lambda i: len(self._assigned[i]), default=None)
+                tasks = self._tasks[worker] if worker is not None else None
+                while worker is not None and self._pending and len(batch) < self.batch_size:
+                    if slot is None:
+                        try:
+                            slot = self._free_slots.get_nowait()
+                        except queue.Empty:
+                            break
+                    gray, hint, verify, queued_at, fut = self._pending.popleft()
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    if time.time() - queued_at > self.max_wait:
+                        fut.set_exception(PoolOverloaded("Frame dibuang: terlalu lama di antrian"))
+                        self.dropped += 1
+                        continue
+                    view = np.ndarray(gray.shape, np.uint8, buffer=self._shm[slot].buf)
+                    view[:] = gray
+                    job_id = self._next_id
+                    self._next_id += 1
+                    self._futures[job_id] = (fut, slot, worker)
+                    self._assigned[worker].add(job_id)
+                    batch.append((job_id, slot, gray.shape, hint, verify))
+                    slot = None
+            if slot is not None:
+                self._free_slots.put(slot)
+            if batch:
+                tasks.put(batch)
+
+    def _fail_pending(self, reason):
+        # Dipanggil dengan self._cond dipegang
+        while self._pending:
+            fut = self._pending.popleft()[-1]
+            if fut.set_running_or_notify_cancel():
+                fut.set_exception(PoolOverloaded(reason))
+
+    def _collect_loop(self):
+        # Bangun saat ada hasil dari worker atau saat proses worker berakhir (sentinel);
+        # timeout supaya worker hasil respawn dan close() ikut terpantau
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                workers = list(enumerate(zip(self._procs, self._results)))
+            if not workers:
+                return
+            handles = [conn for _, (_, conn) in workers if conn is not None]
+            wait_ready(handles + [p.sentinel for _, (p, _) in workers if p.exitcode is None], timeout=1.0)
+            for i, (proc, conn) in workers:
+                # Hasil yang sudah terkirim sebelum worker mati tetap dipakai
+                while conn is not None and conn.poll():
+                    try:
+                        self._handle_message(i, conn.recv())
+                    except (EOFError, OSError):
+                        with self._cond:
+                            if self._results[i] is conn:
+                                self._results[i] = None
+                        conn.close()
+                        proc.join(timeout=1.0)
+                        break
+                if proc.exitcode is not None:
+                    self._replace_worker(i, proc)
+
+    def _handle_message(self, worker, results):
+        if isinstance(results, tuple):
+            # Pesan status dari worker: ("ready" | "error", pid, error)
+            kind, pid, error = results
+            with self._cond:
+                if kind == "ready":
+                    self._ready.add(pid)
+                else:
+                    self.load_errors[pid] = error
+            return
+        for job_id, faces, shapes, error in results:
+            with self._cond:
+                entry = self._futures.pop(job_id, None)
+                if entry is None:
+                    continue
+                fut, slot, _ = entry
+                self._assigned[worker].discard(job_id)
+            self._free_slots.put(slot)
+            if fut.done():
+                continue
+            if error is not None:
+                fut.set_exception(RuntimeError(error))
+            else:
+                fut.set_result((faces, shapes))
+
+    def _replace_worker(self, i, proc):
+        with self._cond:
+            if self._closed or self._procs[i] is not proc or proc.pid in self._reaped:
+                return
+            self._reaped.add(proc.pid)
+            if self._results[i] is not None:
+                self._results[i].close()
+            lost = [self._futures.pop(job_id) for job_id in self._assigned[i]]
+            self._assigned[i].clear()
+            # Hanya worker yang sudah pernah siap yang dijalankan ulang; worker yang berhenti sebelum
+            # model termuat akan gagal lagi (hindari loop spawn), dan dicatat sebagai error load
+            respawn = proc.pid in self._ready
+            self._ready.discard(proc.pid)
+            if not respawn:
+                self.load_errors.setdefault(proc.pid, f"Worker berhenti sebelum siap (exit code {proc.exitcode})")
+                self._results[i] = None
+            else:
+                self.restarts += 1
+                self._spawn(i)
+        for fut, slot, _ in lost:
+            self._free_slots.put(slot)
+            if not fut.done():
+                fut.set_exception(PoolOverloaded(f"Worker inferensi berhenti (exit code {proc.exitcode})"))
+        if respawn:
+            print(f"Worker inferensi {proc.pid} berhenti (exit code {proc.exitcode}), dijalankan ulang")
+
+
+def _worker_main(tasks, results, shm_names):
+    # Model dimuat sekali per proses worker (atau sudah ada bila worker di-fork dari induk yang memuatnya)
+    import models
+    from face_tracking import find_landmarks
+
+    try:
+        detector = models.get_detector()
+        predictor = models.get_predictor()
+    except Exception as e:
+        results.send(("error", os.getpid(), str(e)))
+        return
+    results.send(("ready", os.getpid(), None))
+    shms = [shared_memory.SharedMemory(name=n) for n in shm_names]
+
+    while True:
+        batch = tasks.get()
+        if batch is None:
+            break
+        out = []
+        for job_id, slot, shape, hint, verify in batch:
+            try:
+                gray = np.ndarray(shape, np.uint8, buffer=shms[slot].buf)
+                hint = dlib.rectangle(*hint) if hint is not None else None
+                faces, landmarks = find_landmarks(detector, predictor, gray, hint, verify=verify)
+                faces = [(r.left(), r.top(), r.right(), r.bottom()) for r in faces]
+                out.append((job_id, faces, landmarks, None))
+            except Exception as e:
+                out.append((job_id, [], [], str(e)))
+        results.send(out)
+
+    for s in shms:
+        s.close()
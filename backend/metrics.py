@@ -0,0 +1,180 @@
+# metrics.py
+# Instrumentasi ringan: histogram latensi per stage, counter, gauge, dalam format teks Prometheus.
+#
+# METRICS_ENABLED=0 -> semua metrik diganti objek no-op (overhead praktis nol).
+# TIMING_HEADERS=1  -> response frame membawa header Server-Timing per stage.
+import os, threading, time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+TIMING_HEADERS = os.environ.get("TIMING_HEADERS") == "1"
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry = []   # (name, help, type, fungsi render -> list baris)
+
+
+class _Null:
+    """Pengganti metrik saat METRICS_ENABLED=0."""
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+
+_NULL = _Null()
+_NULL_CONTEXT = nullcontext()
+
+
+class Counter:
+    def __init__(self, name, help, label=None):
+        self.name, self.label = name, label
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append((name, help, "counter", self._render))
+
+    def inc(self, amount=1, label_value=None):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def _render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.label, lv)} {v}" for lv, v in items]
+
+
+class Histogram:
+    def __init__(self, name, help, label=None, buckets=BUCKETS):
+        self.name, self.label, self.buckets = name, label, buckets
+        self._series = {}   # label_value -> [counts per bucket (+Inf), sum]
+        self._lock = threading.Lock()
+        _registry.append((name, help, "histogram", self._render))
+
+    def observe(self, value, label_value=None):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_value)
+            if s is None:
+                s = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def _render(self):
+        lines = []
+        with self._lock:
+            series = [(lv, list(s[0]), s[1]) for lv, s in self._series.items()]
+        for lv, counts, total in series:
+            cum = 0
+            for le, c in zip(self.buckets + ("+Inf",), counts):
+                cum += c
+                lines.append(f"{self.name}_bucket{_labels(self.label, lv, le=le)} {cum}")
+            lines.append(f"{self.name}_sum{_labels(self.label, lv)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label, lv)} {cum}")
+        return lines
+
+
+def counter(name, help, label=None):
+    return Counter(name, help, label) if ENABLED else _NULL
+
+
+def histogram(name, help, label=None):
+    return Histogram(name, help, label) if ENABLED else _NULL
+
+
+def gauge(name, help, fn):
+    """Gauge yang nilainya dibaca dari `fn()` saat /metrics diambil (tidak ada biaya di hot path)."""
+    if ENABLED:
+        _registry.append((name, help, "gauge", lambda: [f"{name} {fn()}"]))
+
+
+def _labels(label, value, le=None):
+    parts = []
+    if label is not None and value is not None:
+        parts.append(f'{label}="{value}"')
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render():
+    """Semua metrik dalam format teks Prometheus (text/plain; version=0.0.4)."""
+    out = []
+    for name, help, kind, fn in _registry:
+        out.append(f"# HELP {name} {help}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(fn())
+    return "\n".join(out) + "\n"
+
+
+# --- Metrik pipeline ---
+STAGE_SECONDS = histogram("smarteye_stage_seconds", "Latensi per stage pemrosesan (detik)", label="stage")
+FRAMES = counter("smarteye_frames_total", "Frame yang diproses, per jalur deteksi", label="path")
+FACES = counter("smarteye_faces_total", "Wajah yang ditemukan")
+BLINKS = counter("smarteye_blinks_total", "Kedipan yang terhitung")
+FRAMES_DROPPED = counter("smarteye_frames_dropped_total", "Frame yang ditolak karena server overload")
+
+
+class FrameTimer:
+    """Mencatat durasi stage berurutan untuk satu frame."""
+
+    __slots__ = ("stages", "_t")
+
+    def __init__(self):
+        self.stages = []
+        self._t = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._t))
+        self._t = now
+
+    def finish(self):
+        total = 0.0
+        for stage, dt in self.stages:
+            STAGE_SECONDS.observe(dt, stage)
+            total += dt
+        STAGE_SECONDS.observe(total, "total")
+
+    def server_timing(self):
+        return ", ".join(f"{stage};dur={dt * 1000:.2f}" for stage, dt in self.stages)
+
+
+class _NullTimer:
+    stages = ()
+
+    def mark(self, stage):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def start_timer():
+    """Timer untuk satu frame; no-op bila metrik dan header timing sama-sama mati."""
+    return FrameTimer() if ENABLED or TIMING_HEADERS else NULL_TIMER
+
+
+def timed(stage):
+    """Context manager untuk stage di luar frame (mis. panggilan Supabase)."""
+    return _Timed(stage) if ENABLED else _NULL_CONTEXT
+
+
+class _Timed:
+    __slots__ = ("stage", "_t")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self._t, self.stage)
+        return False
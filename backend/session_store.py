@@ -0,0 +1,87 @@
+# session_store.py
+# State kedipan per sesi/perangkat, supaya satu backend bisa melayani banyak kamera sekaligus.
+import threading, time
+from collections import deque
+
+
+class BlinkSession:
+    """State kedipan untuk satu sesi (satu kamera/perangkat)."""
+
+    __slots__ = ("key", "lock", "total_blinks", "start_time", "last_blink_time",
+                 "eye_closed", "blink_timestamps", "last_seen", "track", "roi")
+
+    def __init__(self, key, now=None):
+        now = time.time() if now is None else now
+        self.key = key
+        self.lock = threading.Lock()      # dikunci per sesi, bukan global
+        self.total_blinks = 0
+        self.start_time = now
+        self.last_blink_time = now        # Inisialisasi last blink time
+        self.eye_closed = False
+        self.blink_timestamps = deque()
+        self.last_seen = now
+        self.track = None                 # state tracking wajah (face_tracking.FaceTrack)
+        self.roi = None                   # crop terakhir dari client (x, y, scale)
+
+    def update(self, ear, threshold, now):
+        """Perbarui state dari satu nilai EAR. Panggil sambil memegang `lock`."""
+        if ear < threshold and not self.eye_closed:
+            self.eye_closed = True
+        elif ear >= threshold and self.eye_closed:
+            self.total_blinks += 1
+            self.last_blink_time = now
+            self.eye_closed = False
+            self.blink_timestamps.append(now)
+
+    def blink_rate(self, now):
+        """Jumlah kedipan dalam 60 detik terakhir."""
+        while self.blink_timestamps and now - self.blink_timestamps[0] > 60:
+            self.blink_timestamps.popleft()
+        return len(self.blink_timestamps)
+
+
+class SessionRegistry:
+    """Kumpulan BlinkSession berdasarkan key, dengan penghapusan sesi idle (TTL)."""
+
+    def __init__(self, ttl=300, sweep_interval=30):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()     # hanya melindungi dict, bukan isi sesi
+        self._last_sweep = time.time()
+
+    def get_or_create(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._last_sweep > self.sweep_interval:
+                self._evict_locked(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = BlinkSession(key, now)
+            session.last_seen = now
+            return session
+
+    def get(self, key):
+        with self._lock:
+            return self._sessions.get(key)
+
+    def pop(self, key):
+        with self._lock:
+            return self._sessions.pop(key, None)
+
+    def evict_idle(self, now=None):
+        """Hapus sesi yang tidak mengirim frame selama lebih dari `ttl` detik."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._evict_locked(now)
+
+    def _evict_locked(self, now):
+        expired = [k for k, s in self._sessions.items() if now - s.last_seen > self.ttl]
+        for k in expired:
+            del self._sessions[k]
+        self._last_sweep = now
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
@@ -2,6 +2,7 @@ import dlib
 import cv2
 import numpy as np
 import time
+from blink_analysis import TRACK_POINTS, shape_to_array, mean_ear
 
 # Inisialisasi detektor wajah dan predictor dlib
 detector = dlib.get_frontal_face_detector()
@@ -16,13 +17,8 @@ CONSEC_FRAMES = 30
 COUNTER = 0
 last_blink_time = 0
 
-# Fungsi untuk menghitung Eye Aspect Ratio (EAR)
-def eye_aspect_ratio(eye):
-    A = np.linalg.norm(eye[1] - eye[5])
-    B = np.linalg.norm(eye[2] - eye[4])
-    C = np.linalg.norm(eye[0] - eye[3])
-    ear = (A + B) / (2.0 * C)
-    return ear
+# Buffer landmark dipakai ulang di setiap frame (hanya titik yang dipakai, lihat TRACK_POINTS)
+landmarks_buf = np.empty((len(TRACK_POINTS), 2), dtype=np.int32)
 
 while True:
     ret, frame = cap.read()
@@ -33,15 +29,8 @@ while True:
     for face in faces:
         landmarks = predictor(gray, face)
 
-        # Ambil koordinat mata kiri dan kanan
-        left_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 42)])
-        right_eye = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(42, 48)])
-
-        # Hitung EAR untuk kedua mata
-        left_ear = eye_aspect_ratio(left_eye)
-        right_ear = eye_aspect_ratio(right_eye)
-
-        ear = (left_ear + right_ear) / 2.0
+        # Ambil titik mata sekaligus, lalu hitung rata-rata EAR kedua mata
+        ear = mean_ear(shape_to_array(landmarks, landmarks_buf, TRACK_POINTS))
 
         # Jika EAR di bawah threshold, berarti mata tertutup
         if ear < EAR_THRESHOLD:
@@ -0,0 +1,8 @@
+import os, sys
+
+# Modul backend diimpor langsung (seperti app.py), tanpa package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Jangan pernah menulis ke Supabase asli atau memuat model saat import app.py
+os.environ.setdefault("SUPABASE_OFFLINE", "1")
+os.environ.setdefault("PRELOAD_MODELS", "0")
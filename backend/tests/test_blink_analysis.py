@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("dlib")
+
+from bench_ear import legacy_ear, legacy_eye_aspect_ratio, synthetic_shape
+from blink_analysis import TRACK_POINTS, eye_aspect_ratios, landmark_buffer, mean_ear, shape_to_array
+
+
+@pytest.fixture
+def shapes():
+    rng = np.random.default_rng(0)
+    return [synthetic_shape(rng) for _ in range(8)]
+
+
+def test_single_face_matches_legacy_ear(shapes):
+    for shape in shapes:
+        expected = legacy_ear(shape)
+        assert mean_ear(shape_to_array(shape, landmark_buffer(), TRACK_POINTS)) == pytest.approx(expected)
+        assert mean_ear(shape_to_array(shape)) == pytest.approx(expected)  # layout 68 titik
+
+
+def test_batch_matches_legacy_ear(shapes):
+    expected = [legacy_ear(s) for s in shapes]
+    compact = np.stack([shape_to_array(s, None, TRACK_POINTS) for s in shapes])
+    full = np.stack([shape_to_array(s) for s in shapes])
+    assert mean_ear(compact) == pytest.approx(expected)
+    assert mean_ear(full) == pytest.approx(expected)
+
+
+def test_eye_aspect_ratios_per_eye(shapes):
+    full = shape_to_array(shapes[0])
+    left, right = eye_aspect_ratios(full)
+    assert left == pytest.approx(legacy_eye_aspect_ratio(full[36:42].astype(float)))
+    assert right == pytest.approx(legacy_eye_aspect_ratio(full[42:48].astype(float)))
+
+
+def test_track_points_keep_face_bbox(shapes):
+    compact = shape_to_array(shapes[0], None, TRACK_POINTS)
+    assert compact.tolist() == shape_to_array(shapes[0])[list(TRACK_POINTS)].tolist()
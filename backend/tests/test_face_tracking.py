@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+dlib = pytest.importorskip("dlib")
+pytest.importorskip("cv2")
+
+from face_tracking import (FaceTrack, PATH_DETECT, PATH_NONE, PATH_TRACK, commit_track, plan_track,
+                           verify_due)
+
+GRAY = np.zeros((240, 320), np.uint8)
+FACE = dlib.rectangle(100, 60, 180, 140)
+
+
+def landmarks(x0, y0, x1, y1):
+    # commit_track hanya memakai bbox landmark
+    return np.array([[x0, y0], [x1, y1]] * 34, np.float32)
+
+
+def detected_track():
+    track = FaceTrack()
+    assert plan_track(track, GRAY, mode="roi") is None
+    assert commit_track(track, GRAY, None, [FACE], [landmarks(105, 65, 175, 135)], mode="roi") == PATH_DETECT
+    return track
+
+
+def test_first_frame_detects_then_tracks_until_every_n():
+    track = detected_track()
+    for _ in range(3):
+        hint = plan_track(track, GRAY, mode="roi", every_n=3)
+        assert hint is not None
+        assert commit_track(track, GRAY, hint, [hint], [landmarks(105, 65, 175, 135)], mode="roi") == PATH_TRACK
+    assert plan_track(track, GRAY, mode="roi", every_n=3) is None  # deteksi ulang paksa
+
+
+def test_stale_detection_forces_detect():
+    track = detected_track()
+    track.detected_at = time.monotonic() - 5
+    assert plan_track(track, GRAY, mode="roi", every_sec=1.0) is None
+
+
+def test_off_mode_always_detects():
+    track = FaceTrack()
+    commit_track(track, GRAY, None, [FACE], [landmarks(105, 65, 175, 135)], mode="off")
+    assert plan_track(track, GRAY, mode="off") is None
+
+
+def test_no_face_on_detect_is_none():
+    track = detected_track()
+    assert commit_track(track, GRAY, None, [], [], mode="roi") == PATH_NONE
+    assert track.rect is None
+
+
+def test_failed_verify_is_none_and_redetects():
+    track = detected_track()
+    hint = plan_track(track, GRAY, mode="roi")
+    assert commit_track(track, GRAY, hint, [], [], mode="roi") == PATH_NONE
+    assert plan_track(track, GRAY, mode="roi") is None
+
+
+def test_track_follows_landmarks_and_drops_on_size_jump():
+    track = detected_track()
+    hint = plan_track(track, GRAY, mode="roi")
+    commit_track(track, GRAY, hint, [hint], [landmarks(115, 65, 185, 135)], mode="roi")
+    assert track.rect.left() > hint.left()  # rect ikut bergeser bersama landmark
+
+    hint = plan_track(track, GRAY, mode="roi")
+    commit_track(track, GRAY, hint, [hint], [landmarks(10, 10, 300, 230)], mode="roi")
+    assert plan_track(track, GRAY, mode="roi") is None  # bbox membesar drastis: tracking hilang
+
+
+def test_verify_due_every_n_track_frames():
+    track = detected_track()
+    due = []
+    for _ in range(8):
+        plan_track(track, GRAY, mode="roi", every_n=10, every_sec=60)
+        due.append(verify_due(track, mode="roi", every_n=4))
+    assert due == [False, False, False, True, False, False, False, True]
+    assert not verify_due(track, mode="correlation", every_n=1)
@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("cv2")
+pytest.importorskip("dlib")
+
+import app as app_module
+
+
+@pytest.mark.parametrize("roi", ["1,2", "a,b,c", "1,2,3,4"])
+def test_malformed_roi_header_is_rejected(roi):
+    res = app_module.app.test_client().post("/process_frame/raw", data=b"\xff\xd8",
+                                            headers={"X-Roi": roi, "Content-Type": "image/jpeg"})
+    assert res.status_code == 400
+
+
+@pytest.mark.parametrize("roi", ["1,2", {"x": 1, "y": 2}, [1, 2, 3]])
+def test_malformed_roi_json_is_rejected(roi):
+    res = app_module.app.test_client().post("/process_frame", json={"image": "", "roi": roi})
+    assert res.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("cv2")
+pytest.importorskip("dlib")
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    db = app_module.supabase
+    db.tables["blink_history"] = [
+        {"id": i, "user_id": 1, "device_id": 2, "captured_at": f"2026-01-0{1 + i // 3}T10:00:00", "blink_count": i}
+        for i in range(1, 8)  # tiap 3 baris punya captured_at yang sama
+    ]
+    app_module.history_cache.clear()
+    yield app_module.app.test_client()
+    db.tables.pop("blink_history", None)
+    app_module.history_cache.clear()
+
+
+def test_keyset_pagination_keeps_rows_with_equal_captured_at(client):
+    seen, before = [], None
+    while True:
+        res = client.get("/history", query_string={"limit": 2, **({"before": before} if before else {})})
+        assert res.status_code == 200
+        seen.extend(r["id"] for r in res.get_json())
+        before = res.headers.get("X-Next-Before")
+        if before is None:
+            break
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_history_rejects_non_positive_limit(client):
+    assert client.get("/history?limit=0").status_code == 400
+    assert client.get("/history?before=2026-01-01T10:00:00,abc").status_code == 400
+
+
+def test_summary_counts_every_row(client, monkeypatch):
+    monkeypatch.setattr(app_module, "SUMMARY_PAGE_SIZE", 2)
+    res = client.get("/history/summary?period=device&days=100000")
+    assert res.status_code == 200
+    assert sum(r["blink_count"] for r in res.get_json()) == sum(range(1, 8))
@@ -0,0 +1,56 @@
+import time
+
+from history_writer import HistoryWriter
+from supabase_client import LocalSupabaseClient
+
+
+def wait_until(cond, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def make_writer(client, journal, **kwargs):
+    kwargs.setdefault("flush_interval", 0.02)
+    return HistoryWriter(client, batch_size=7, journal_path=str(journal),
+                         base_backoff=0.02, max_backoff=0.1, **kwargs).start()
+
+
+def test_shared_journal_no_duplicates_or_loss(tmp_path):
+    client = LocalSupabaseClient()
+    client.fail_writes = True
+    journal = tmp_path / "journal.jsonl"
+    writers = [make_writer(client, journal) for _ in range(2)]
+
+    expected = []
+    for i in range(300):
+        w = writers[i % 2]
+        w.put({"seq": i})
+        expected.append(i)
+        if i == 150:
+            client.fail_writes = False  # database pulih di tengah jalan, journal diputar ulang
+        time.sleep(0.001)
+
+    assert wait_until(lambda: all(w.pending() == 0 for w in writers) and not journal.exists())
+    for w in writers:
+        w.close()
+    assert sorted(r["seq"] for r in client.tables["blink_history"]) == expected
+
+
+def test_rejected_row_goes_to_dead_letter(tmp_path):
+    client = LocalSupabaseClient()
+    client.reject_row = lambda r: r["seq"] == 3  # mis. device_id yang tidak ada (foreign key)
+    dead = tmp_path / "rejected.jsonl"
+    writer = make_writer(client, tmp_path / "journal.jsonl", dead_letter_path=str(dead))
+    for i in range(20):
+        writer.put({"seq": i})
+
+    assert wait_until(lambda: writer.pending() == 0 and len(client.tables.get("blink_history", [])) == 19)
+    writer.close()
+    assert sorted(r["seq"] for r in client.tables["blink_history"]) == [i for i in range(20) if i != 3]
+    assert not (tmp_path / "journal.jsonl").exists()
+    lines = dead.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1 and '"seq": 3' in lines[0]
@@ -0,0 +1,80 @@
+import os, signal, sys, time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("dlib")
+
+from inference_pool import InferencePool, PoolOverloaded
+
+
+@pytest.fixture
+def stalled_pool():
+    # Tanpa worker dan tanpa slot: dispatcher tidak pernah mengambil frame, antrian hanya terisi
+    pool = InferencePool(0, queue_size=2, slots=0, max_wait=60.0)
+    yield pool
+    pool.close()
+
+
+def test_drop_oldest_skips_cancelled_futures(stalled_pool):
+    gray = np.zeros((120, 160), np.uint8)
+    for _ in range(2):
+        with pytest.raises(PoolOverloaded):
+            stalled_pool.infer(gray, timeout=0.01)  # timeout -> future di-cancel, tetap di antrian
+
+    fut = stalled_pool.submit(gray)  # dulu: InvalidStateError dari set_exception pada future ter-cancel
+    assert not fut.done()
+    assert stalled_pool.queue_depth() == 2
+    assert stalled_pool.dropped == 0
+
+
+def test_overloaded_pool_returns_503(stalled_pool, monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    pytest.importorskip("flask")
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "get_pool", lambda: stalled_pool)
+    monkeypatch.setattr(app_module, "INFERENCE_TIMEOUT", 0.01)
+    client = app_module.app.test_client()
+    jpeg = cv2.imencode(".jpg", np.zeros((120, 160, 3), np.uint8))[1].tobytes()
+
+    # Frame pertama mengisi antrian dengan future yang timeout; frame berikutnya memicu drop-oldest
+    for _ in range(4):
+        res = client.post("/process_frame/raw", data=jpeg,
+                          headers={"Content-Type": "image/jpeg", "X-Session-Id": "overload"})
+        assert res.status_code == 503
+        assert "suggested_interval_ms" in res.get_json()
+
+
+def _slow_detector(gray):
+    if gray[0, 0]:  # frame penanda: tahan worker supaya bisa dimatikan di tengah pekerjaan
+        time.sleep(30)
+    return []
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="butuh start method fork")
+def test_dead_worker_fails_its_frames_and_is_respawned(monkeypatch):
+    import models
+
+    # Worker hasil fork mewarisi model palsu ini, jadi tidak perlu file shape_predictor
+    monkeypatch.setattr(models, "get_detector", lambda: _slow_detector)
+    monkeypatch.setattr(models, "get_predictor", lambda: None)
+    pool = InferencePool(1, queue_size=4, start_method="fork", max_wait=60.0)
+    try:
+        gray = np.zeros((120, 160), np.uint8)
+        assert pool.infer(gray, timeout=10) == ([], [])
+
+        stuck = gray.copy()
+        stuck[0, 0] = 1
+        fut = pool.submit(stuck)
+        deadline = time.monotonic() + 10
+        while not any(pool._assigned) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        os.kill(pool._procs[0].pid, signal.SIGKILL)
+
+        with pytest.raises(PoolOverloaded):
+            fut.result(timeout=10)
+        assert pool.infer(gray, timeout=10) == ([], [])  # slot kembali, worker baru memproses
+        assert pool.restarts == 1
+    finally:
+        pool.close()
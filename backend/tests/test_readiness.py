@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("dlib")
+
+import models
+from inference_pool import InferencePool
+
+
+def test_pool_not_ready_when_worker_cannot_load_model(monkeypatch, tmp_path):
+    monkeypatch.setenv("LANDMARK_MODEL_PATH", str(tmp_path / "tidak-ada.dat"))  # dibaca ulang di worker spawn
+    pool = InferencePool(1, queue_size=2)
+    try:
+        deadline = time.monotonic() + 60
+        while not pool.load_errors and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.load_errors
+        assert not pool.ready()
+        assert pool.status()["ready_workers"] == 0
+    finally:
+        pool.close()
+
+
+def test_ready_probe_starts_model_loading(monkeypatch):
+    pytest.importorskip("flask")
+    pytest.importorskip("cv2")
+    import app as app_module
+
+    calls = []
+    monkeypatch.setattr(app_module, "INFERENCE_WORKERS", 0)
+    monkeypatch.setattr(models, "_predictor", None)
+    monkeypatch.setattr(models, "load_async", lambda: calls.append(1))
+
+    res = app_module.app.test_client().get("/ready")
+    assert res.status_code == 503
+    assert res.get_json()["ready"] is False
+    assert calls  # PRELOAD_MODELS=0 tidak boleh membuat /ready 503 selamanya
@@ -0,0 +1,50 @@
+import pytest
+
+from session_store import SessionRegistry
+
+
+def test_sessions_are_isolated():
+    reg = SessionRegistry(ttl=300)
+    a, b = reg.get_or_create("kamera-a", now=0), reg.get_or_create("kamera-b", now=0)
+    assert a is not b
+    for ear, now in ((0.1, 1.0), (0.3, 1.1)):  # satu kedipan hanya di sesi a
+        a.update(ear, 0.2, now)
+    assert (a.total_blinks, b.total_blinks) == (1, 0)
+    assert reg.get_or_create("kamera-a", now=2) is a
+    assert len(reg) == 2
+
+
+def test_idle_sessions_are_evicted_after_ttl():
+    reg = SessionRegistry(ttl=10, sweep_interval=5)
+    reg.get_or_create("idle", now=0)
+    reg.get_or_create("aktif", now=0)
+    reg.get_or_create("aktif", now=9)
+    assert reg.evict_idle(now=10) == 0      # belum lewat ttl
+    assert reg.evict_idle(now=15) == 1
+    assert reg.get("idle") is None and reg.get("aktif") is not None
+
+
+def test_get_or_create_sweeps_lazily():
+    reg = SessionRegistry(ttl=10, sweep_interval=5)
+    reg.evict_idle(now=0)                   # samakan jam sweep dengan waktu uji
+    reg.get_or_create("idle", now=0)
+    reg.get_or_create("lain", now=20)       # sweep otomatis, "idle" sudah lewat ttl
+    assert reg.get("idle") is None and len(reg) == 1
+
+
+def test_stop_detection_validates_ids_before_popping_session():
+    pytest.importorskip("flask")
+    pytest.importorskip("cv2")
+    pytest.importorskip("dlib")
+    import app as app_module
+
+    app_module.sessions.get_or_create("abc", now=0)  # sesi > 10 detik
+    client = app_module.app.test_client()
+    res = client.post("/stop_detection", json={"user_id": 1, "device_id": 2, "session_id": "abc"})
+    assert res.status_code == 400
+    assert app_module.sessions.get("abc") is not None  # data kedipan tidak hilang
+
+    res = client.post("/stop_detection", json={"user_id": 1, "device_id": 2},
+                      headers={"X-Session-Id": "abc"})
+    assert res.status_code == 200
+    assert app_module.sessions.get("abc") is None
@@ -15,12 +15,30 @@ export async function stopDetection({ userId, deviceId, sessionId = null }) {
   return res.json();
 }
 
-export async function fetchHistory({ userId, deviceId, limit = 50 }) {
+// `before`: cursor keyset "captured_at,id" dari halaman sebelumnya (nextBefore);
+// `since`: hanya record sejak waktu ini (ISO string).
+// Kembalikan { rows, nextBefore }; nextBefore null bila tidak ada halaman berikutnya.
+export async function fetchHistory({ userId, deviceId, limit = 50, before = null, since = null }) {
   const url = new URL(`${API_BASE}/history`);
   if (userId) url.searchParams.set("user_id", userId);
   if (deviceId) url.searchParams.set("device_id", deviceId);
+  if (before) url.searchParams.set("before", before);
+  if (since) url.searchParams.set("since", since);
   url.searchParams.set("limit", limit);
   const res = await fetch(url);
   if (!res.ok) throw new Error(await res.text());
+  return { rows: await res.json(), nextBefore: res.headers.get("X-Next-Before") };
+}
+
+// Rollup dari backend: period = "daily" | "weekly" | "device"
+export async function fetchHistorySummary({ period = "daily", userId, deviceId, days = 30 }) {
+  const url = new URL(`${API_BASE}/history/summary`);
+  url.searchParams.set("period", period);
+  if (userId) url.searchParams.set("user_id", userId);
+  if (deviceId) url.searchParams.set("device_id", deviceId);
+  url.searchParams.set("days", days);
+  url.searchParams.set("tz_offset_min", -new Date().getTimezoneOffset());
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(await res.text());
   return res.json();
 }
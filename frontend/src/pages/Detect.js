@@ -3,12 +3,23 @@ import axios from 'axios';
 
 // Konfigurasi API
 const API_URL = 'http://127.0.0.1:5000';
+const WS_URL = API_URL.replace(/^http/, 'ws'); // streaming frame biner lewat /ws/frames
 
 // === CHANGED: sementara hardcode user/device; nanti ambil dari auth/device manager ===
 const USER_ID = 1;       // FK → profiles.id
 const DEVICE_ID = 2;     // FK → devices.id
 const SESSION_ID = null; // opsional (isi kalau kamu sudah punya sesi)
 
+// Laju kirim adaptif: maksimal 1 request in-flight, interval mengikuti RTT & hint server
+const MIN_INTERVAL_MS = 100;
+const MAX_INTERVAL_MS = 1000;
+const WS_CONNECT_TIMEOUT_MS = 3000; // WebSocket belum terbuka setelah ini → pakai POST saja
+const KEEPALIVE_MS = 500;     // frame tetap dikirim minimal tiap 500ms walau tidak berubah
+const DIFF_THRESHOLD = 2;     // rata-rata beda piksel (0-255) area mata; di bawah ini frame dilewati
+const FULL_WIDTH = 240;       // lebar frame penuh (sebelum wajah ditemukan)
+const CROP_WIDTH = 160;       // lebar maksimum crop wajah
+const THUMB_W = 48, THUMB_H = 16;
+
 // Ikon inline SVG
 const PlayIcon = (props) => (
     <svg {...props} xmlns="http://www.w3.org/2000/svg" width="24" height="24"
@@ -62,7 +73,16 @@ function Detect() {
 
   const videoRef = useRef(null);
   const streamRef = useRef(null);
-  const intervalRef = useRef(null);
+  const loopRef = useRef(null);
+  const activeRef = useRef(false);
+  const wsRef = useRef(null);
+  const roiRef = useRef(null);          // crop wajah {x, y, w, h} dalam koordinat video
+  const sentRoiRef = useRef('');        // roi terakhir yang dikirim lewat WebSocket
+  const thumbRef = useRef(null);        // thumbnail area mata frame terakhir yang dikirim
+  const lastSentRef = useRef(0);
+  const sentAtRef = useRef(0);
+  const rttRef = useRef(0);
+  const serverIntervalRef = useRef(MIN_INTERVAL_MS);
 
   // Audio untuk notifikasi
   const beep = useRef(new Audio("https://actions.google.com/sounds/v1/alarms/beep_short.ogg"));
@@ -88,15 +108,189 @@ function Detect() {
     };
   }, []);
 
-  const captureFrame = () => {
-    if (!videoRef.current || videoRef.current.readyState < 2) return null;
+  // Frame penuh diperkecil ke 240px, atau (setelah server mengirim face_box) crop area wajah saja
+  const captureCanvas = () => {
+    const video = videoRef.current;
+    if (!video || video.readyState < 2) return null;
+    const crop = roiRef.current || { x: 0, y: 0, w: video.videoWidth, h: video.videoHeight };
+    const width = roiRef.current ? Math.min(CROP_WIDTH, crop.w) : FULL_WIDTH;
+    const scale = width / crop.w;
     const canvas = document.createElement("canvas");
-    const width = 240;
-    const height = (videoRef.current.videoHeight / videoRef.current.videoWidth) * width;
     canvas.width = width;
-    canvas.height = height;
-    canvas.getContext("2d").drawImage(videoRef.current, 0, 0, width, height);
-    return canvas.toDataURL("image/jpeg", 0.6);
+    canvas.height = Math.round(crop.h * scale);
+    canvas.getContext("2d").drawImage(video, crop.x, crop.y, crop.w, crop.h, 0, 0, canvas.width, canvas.height);
+    return { canvas, roi: { x: crop.x, y: crop.y, scale } };
+  };
+
+  // Bandingkan area mata (atau seluruh frame bila belum ada crop) dengan frame terakhir yang dikirim
+  const frameChanged = (canvas) => {
+    const thumb = document.createElement("canvas");
+    thumb.width = THUMB_W;
+    thumb.height = THUMB_H;
+    const sy = roiRef.current ? canvas.height * 0.25 : 0;
+    const sh = roiRef.current ? canvas.height * 0.3 : canvas.height;
+    const ctx = thumb.getContext("2d", { willReadFrequently: true });
+    ctx.drawImage(canvas, 0, sy, canvas.width, sh, 0, 0, THUMB_W, THUMB_H);
+    const px = ctx.getImageData(0, 0, THUMB_W, THUMB_H).data;
+
+    const gray = new Uint8Array(THUMB_W * THUMB_H);
+    for (let i = 0; i < gray.length; i++) gray[i] = (px[i * 4] + px[i * 4 + 1] + px[i * 4 + 2]) / 3;
+
+    const prev = thumbRef.current;
+    let diff = Infinity;
+    if (prev) {
+      diff = 0;
+      for (let i = 0; i < gray.length; i++) diff += Math.abs(gray[i] - prev[i]);
+      diff /= gray.length;
+    }
+    if (diff < DIFF_THRESHOLD) return false;
+    thumbRef.current = gray;
+    return true;
+  };
+
+  // Crop hanya diganti saat wajah mendekati tepi crop, supaya tracking di server tetap berlaku
+  const updateRoi = (box) => {
+    const video = videoRef.current;
+    if (!box || !video) {
+      roiRef.current = null; // wajah hilang → kirim frame penuh lagi
+      return;
+    }
+    const [l, t, r, b] = box;
+    const cur = roiRef.current;
+    if (cur && l > cur.x + 0.1 * cur.w && r < cur.x + 0.9 * cur.w &&
+        t > cur.y + 0.1 * cur.h && b < cur.y + 0.9 * cur.h) return;
+
+    const mw = (r - l) * 0.5, mh = (b - t) * 0.5;
+    const x = Math.max(0, Math.round(l - mw));
+    const y = Math.max(0, Math.round(t - mh));
+    roiRef.current = {
+      x, y,
+      w: Math.min(video.videoWidth, Math.round(r + mw)) - x,
+      h: Math.min(video.videoHeight, Math.round(b + mh)) - y,
+    };
+  };
+
+  const nextDelay = () => {
+    const elapsed = performance.now() - sentAtRef.current;
+    const interval = Math.min(MAX_INTERVAL_MS,
+      Math.max(MIN_INTERVAL_MS, rttRef.current * 1.2, serverIntervalRef.current));
+    return Math.max(0, interval - elapsed);
+  };
+
+  const scheduleNext = (delay) => {
+    if (activeRef.current) loopRef.current = setTimeout(sendFrame, delay);
+  };
+
+  const onFrameResult = (data) => {
+    const rtt = performance.now() - sentAtRef.current;
+    rttRef.current = rttRef.current ? 0.8 * rttRef.current + 0.2 * rtt : rtt;
+    if (data.suggested_interval_ms) serverIntervalRef.current = data.suggested_interval_ms;
+    if (!data.error) updateRoi(data.face_box);
+    handleResult(data);
+  };
+
+  const handleResult = (data) => {
+    if (!data || data.error) return;
+
+    setStats({
+      total_blinks: data.total_blinks,
+      blink_rate: data.blink_rate
+    });
+
+    if (data.message.includes("⚠️")) {
+      setWarning(data.message);
+      showNotification(data.message);
+      beep.current.play().catch(e => console.log("Gagal memutar audio:", e.message));
+    } else if (data.message.includes("✅")) {
+      // biarkan pesan selesai sesi
+    } else {
+      if (!warning.startsWith('✅')) setWarning('');
+    }
+  };
+
+  // Satu koneksi WebSocket untuk kirim JPEG mentah; kalau gagal, otomatis fallback ke POST JSON
+  const openFrameSocket = () => {
+    if (typeof WebSocket === 'undefined') return;
+    const params = new URLSearchParams({ device_id: DEVICE_ID });
+    if (SESSION_ID !== null) params.set('session_id', SESSION_ID);
+
+    const ws = new WebSocket(`${WS_URL}/ws/frames?${params}`);
+    // Proxy/server yang menahan upgrade bisa membuat socket CONNECTING selamanya
+    const connectTimer = setTimeout(() => {
+      if (wsRef.current !== ws || ws.readyState !== WebSocket.CONNECTING) return;
+      wsRef.current = null; // sendFrame berikutnya lewat POST
+      ws.close();
+    }, WS_CONNECT_TIMEOUT_MS);
+    ws.onopen = () => clearTimeout(connectTimer);
+    ws.onmessage = (e) => {
+      onFrameResult(JSON.parse(e.data));
+      scheduleNext(nextDelay());
+    };
+    ws.onerror = ws.onclose = () => {
+      clearTimeout(connectTimer);
+      if (wsRef.current !== ws) return;
+      wsRef.current = null;
+      scheduleNext(MIN_INTERVAL_MS); // lanjut lewat POST JSON
+    };
+    wsRef.current = ws;
+  };
+
+  // Satu iterasi loop kirim; iterasi berikutnya dijadwalkan setelah hasil frame ini diterima
+  const sendFrame = async () => {
+    const ws = wsRef.current;
+    if (ws && ws.readyState === WebSocket.CONNECTING) return scheduleNext(MIN_INTERVAL_MS);
+
+    const captured = captureCanvas();
+    if (!captured) return scheduleNext(MIN_INTERVAL_MS);
+    const now = performance.now();
+    if (!frameChanged(captured.canvas) && now - lastSentRef.current < KEEPALIVE_MS) {
+      return scheduleNext(MIN_INTERVAL_MS);
+    }
+    lastSentRef.current = now;
+
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      const roi = JSON.stringify({ roi: captured.roi });
+      if (roi !== sentRoiRef.current) {
+        ws.send(roi);
+        sentRoiRef.current = roi;
+      }
+      const blob = await new Promise(r => captured.canvas.toBlob(r, "image/jpeg", 0.6));
+      if (!blob || wsRef.current !== ws) return scheduleNext(MIN_INTERVAL_MS);
+      sentAtRef.current = performance.now();
+      ws.send(blob); // hasil datang di ws.onmessage, yang menjadwalkan frame berikutnya
+      return;
+    }
+
+    const frame = captured.canvas.toDataURL("image/jpeg", 0.6);
+    sentAtRef.current = performance.now();
+    try {
+      let res;
+      for (let i = 0; i < 3; i++) {
+        try {
+          // device_id/session_id dipakai backend sebagai key state per sesi
+          res = await axios.post(`${API_URL}/process_frame`, {
+            image: frame, device_id: DEVICE_ID, session_id: SESSION_ID, roi: captured.roi
+          });
+          break;
+        } catch (err) {
+          // Server sibuk (503): ikuti hint backpressure, jangan hentikan deteksi
+          if (err.response?.status === 503) {
+            onFrameResult(err.response.data);
+            return scheduleNext(nextDelay());
+          }
+          if (i < 2) await new Promise(r => setTimeout(r, Math.pow(2, i) * 500));
+          else throw err;
+        }
+      }
+      if (!res) return scheduleNext(nextDelay());
+
+      onFrameResult(res.data);
+      scheduleNext(nextDelay());
+    } catch (err) {
+      console.error("Error processing frame:", err);
+      setWarning("Gagal memproses frame atau koneksi terputus.");
+      stopDetection(false);
+    }
   };
 
   const startDetection = async () => {
@@ -113,44 +307,14 @@ function Detect() {
       setIsDetecting(true);
       setWarning('');
 
-      // Kirim frame tiap 100ms
-      intervalRef.current = setInterval(async () => {
-        const frame = captureFrame();
-        if (!frame) return;
-
-        try {
-          let res;
-          for (let i = 0; i < 3; i++) {
-            try {
-              res = await axios.post(`${API_URL}/process_frame`, { image: frame });
-              break;
-            } catch (err) {
-              if (i < 2) await new Promise(r => setTimeout(r, Math.pow(2, i) * 500));
-              else throw err;
-            }
-          }
-          if (!res) return;
-
-          setStats({
-            total_blinks: res.data.total_blinks,
-            blink_rate: res.data.blink_rate
-          });
-
-          if (res.data.message.includes("⚠️")) {
-            setWarning(res.data.message);
-            showNotification(res.data.message);
-            beep.current.play().catch(e => console.log("Gagal memutar audio:", e.message));
-          } else if (res.data.message.includes("✅")) {
-            // biarkan pesan selesai sesi
-          } else {
-            if (!warning.startsWith('✅')) setWarning('');
-          }
-        } catch (err) {
-          console.error("Error processing frame:", err);
-          setWarning("Gagal memproses frame atau koneksi terputus.");
-          stopDetection(false);
-        }
-      }, 100);
+      roiRef.current = null;
+      sentRoiRef.current = '';
+      thumbRef.current = null;
+      rttRef.current = 0;
+      serverIntervalRef.current = MIN_INTERVAL_MS;
+      activeRef.current = true;
+      openFrameSocket();
+      scheduleNext(0);
 
     } catch (err) {
       setWarning("❌ Tidak bisa mengakses kamera: " + err.message);
@@ -158,7 +322,13 @@ function Detect() {
   };
 
   const stopDetection = async (saveRecord = true) => {
-    clearInterval(intervalRef.current);
+    activeRef.current = false;
+    clearTimeout(loopRef.current);
+    if (wsRef.current) {
+      const ws = wsRef.current;
+      wsRef.current = null;
+      ws.close();
+    }
     if (streamRef.current) {
       streamRef.current.getTracks().forEach(track => track.stop());
       videoRef.current.srcObject = null;
@@ -11,13 +11,16 @@ const API_BASE = process.env.REACT_APP_API_BASE || "http://127.0.0.1:5000";
 
 function History() {
   const [records, setRecords] = useState([]);
+  const [nextBefore, setNextBefore] = useState(null); // cursor halaman berikutnya
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [deletingId, setDeletingId] = useState(null);
 
   const load = async () => {
     try {
-      const rows = await fetchHistory({ userId: USER_ID, deviceId: DEVICE_ID, limit: 50 });
-      setRecords(rows ?? []);
+      const page = await fetchHistory({ userId: USER_ID, deviceId: DEVICE_ID, limit: 50 });
+      setRecords(page.rows ?? []);
+      setNextBefore(page.nextBefore);
     } catch (error) {
       console.error("Error fetching history:", error);
     } finally {
@@ -25,6 +28,20 @@ function History() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextBefore) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchHistory({ userId: USER_ID, deviceId: DEVICE_ID, limit: 50, before: nextBefore });
+      setRecords((prev) => [...prev, ...(page.rows ?? [])]);
+      setNextBefore(page.nextBefore);
+    } catch (error) {
+      console.error("Error fetching history:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     load();
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -106,6 +123,12 @@ function History() {
       ) : (
         <p className="text-muted">Belum ada history deteksi.</p>
       )}
+
+      {nextBefore && (
+        <button className="btn btn-outline-secondary" onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? "Memuat..." : "Muat lebih banyak"}
+        </button>
+      )}
     </div>
   );
 }
@@ -1,14 +1,12 @@
 // frontend/src/pages/Home.js
 import React, { useState, useEffect } from 'react';
-import axios from 'axios';
 import { Line } from 'react-chartjs-2';
 import { Chart as ChartJS, CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend } from 'chart.js';
 import { Container, Card, Row, Col, Tabs, Tab, Spinner } from 'react-bootstrap';
+import { fetchHistory, fetchHistorySummary } from '../api/blink';
 
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend);
 
-const API_URL = 'http://127.0.0.1:5000';
-
 function Home() {
     const [todayData, setTodayData] = useState(null);
     const [dailyData, setDailyData] = useState(null);
@@ -37,19 +35,14 @@ function Home() {
 
     useEffect(() => {
         // **PINDAHKAN FUNGSI KE DALAM USEEFFECT**
+        // Agregasi dilakukan di backend; di sini tinggal menyusun dataset chart
         const processTodayData = (records) => {
-            const today = new Date().toDateString();
-            const todayRecords = records
-                .filter(r => new Date(r.captured_at).toDateString() === today)
+            const todayRecords = [...records]
                 .sort((a, b) => new Date(a.captured_at) - new Date(b.captured_at));
 
             if (todayRecords.length > 0) {
                 const labels = todayRecords.map(r => new Date(r.captured_at).toLocaleTimeString('en-US', { hour: 'numeric', minute: '2-digit', hour12: true }));
-                const blinksPerMinute = todayRecords.map(r => 
-                    r.stare_duration_sec > 0 
-                        ? ((r.blink_count / r.stare_duration_sec) * 60).toFixed(2) 
-                        : 0
-                );
+                const blinksPerMinute = todayRecords.map(r => r.blink_per_minute ?? 0);
 
                 setTodayData({
                     labels,
@@ -58,26 +51,10 @@ function Home() {
             }
         };
 
-        const processDailyData = (records) => {
-            const dailyAggregates = records.reduce((acc, record) => {
-                const dateKey = new Date(record.captured_at).toISOString().split('T')[0];
-                if (!acc[dateKey]) {
-                    acc[dateKey] = { totalBlinkCount: 0, totalDurationSec: 0, date: new Date(record.captured_at) };
-                }
-                acc[dateKey].totalBlinkCount += record.blink_count;
-                acc[dateKey].totalDurationSec += record.stare_duration_sec;
-                return acc;
-            }, {});
-
-            const sortedDays = Object.values(dailyAggregates).sort((a, b) => a.date - b.date);
-
-            if (sortedDays.length > 0) {
-                const labels = sortedDays.map(day => day.date.toLocaleDateString('id-ID', { day: 'numeric', month: 'short', year: 'numeric' }));
-                const blinksPerMinute = sortedDays.map(day => 
-                    day.totalDurationSec > 0 
-                        ? ((day.totalBlinkCount / day.totalDurationSec) * 60).toFixed(2) 
-                        : 0
-                );
+        const processDailyData = (days) => {
+            if (days.length > 0) {
+                const labels = days.map(day => new Date(`${day.key}T00:00:00`).toLocaleDateString('id-ID', { day: 'numeric', month: 'short', year: 'numeric' }));
+                const blinksPerMinute = days.map(day => day.avg_blink_per_minute);
 
                 setDailyData({
                     labels,
@@ -89,14 +66,20 @@ function Home() {
         // Fungsi utama yang menjalankan semuanya
         const fetchAndProcessHistory = async () => {
             try {
-                const response = await axios.get(`${API_URL}/history`);
-                const records = response.data;
-                if (!records || records.length === 0) {
+                const midnight = new Date();
+                midnight.setHours(0, 0, 0, 0);
+                const [today, days] = await Promise.all([
+                    // Sesi hari ini saja (bukan seluruh history)
+                    fetchHistory({ since: midnight.toISOString(), limit: 200 }),
+                    // Rollup harian dihitung & di-cache di server
+                    fetchHistorySummary({ period: 'daily', days: 365 }),
+                ]);
+                if (today.rows.length === 0 && days.length === 0) {
                     throw new Error("Belum ada data history.");
                 }
-                
-                processTodayData(records);
-                processDailyData(records);
+
+                processTodayData(today.rows);
+                processDailyData(days);
 
             } catch (err) {
                 console.error("Error fetching or processing history:", err);